@@ -0,0 +1,159 @@
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from tracing import traced
+from vocabulary_bank import LEVELS
+
+DAY = 24 * 3600
+
+# A level counts as mastered at this (smoothed) accuracy over at least MIN_ANSWERS answers
+MASTERY_ACCURACY = 0.8
+MIN_ANSWERS = 5
+# Accuracies start from PRIOR_ANSWERS pseudo-answers at PRIOR_ACCURACY, so two lucky answers are not mastery
+PRIOR_ANSWERS = 4
+PRIOR_ACCURACY = 0.5
+
+INSERT_EVENT = '''INSERT OR IGNORE INTO answer_events
+    (attempt_id, position, user_id, pair, item_id, item_level, question_type, correct, answered_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+
+def score_answers(questions, answers):
+    # One bool per question, compared in a single array operation
+    expected = np.array([q['correct_answer'] for q in questions], dtype=object)
+    given = np.array(list(answers)[:len(questions)], dtype=object)
+    if len(given) < len(expected):
+        return np.concatenate([expected[:len(given)] == given, np.zeros(len(expected) - len(given), dtype=bool)])
+    return np.asarray(expected == given, dtype=bool)
+
+
+def smoothed_accuracy(correct, answers, prior=PRIOR_ACCURACY):
+    return (correct + PRIOR_ANSWERS * prior) / (answers + PRIOR_ANSWERS)
+
+
+def estimate_levels(user_levels):
+    """Estimated level per user from a frame of (user_id, item_level, answers, correct) rows.
+
+    A user is placed one level above the highest level they have mastered.
+    """
+    totals = user_levels.groupby(['user_id', 'item_level'])[['answers', 'correct']].sum()
+    if totals.empty:
+        return pd.Series(dtype=object)
+    mastered = ((smoothed_accuracy(totals['correct'], totals['answers']) >= MASTERY_ACCURACY)
+                & (totals['answers'] >= MIN_ANSWERS))
+    rank = totals.index.get_level_values('item_level').map({level: i for i, level in enumerate(LEVELS)})
+    rank = np.where(mastered & ~pd.isna(rank), rank, -1).astype(int)
+    best = pd.Series(rank, index=totals.index).groupby(level='user_id').max()
+    return pd.Series(np.array(LEVELS, dtype=object)[np.minimum(best.to_numpy() + 1, len(LEVELS) - 1)],
+                     index=best.index)
+
+
+def higher_level(a, b):
+    rank = {level: i for i, level in enumerate(LEVELS)}
+    return a if rank.get(a, 0) >= rank.get(b, 0) else b
+
+
+class Analytics:
+    """Answer history and the statistics derived from it.
+
+    Every answer is stored in `answer_events`. A trigger adds it to the
+    per-user (`user_stats`) and per-item (`item_stats`) totals in the same
+    transaction, so the reports below read those small tables instead of
+    rescanning the history.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def record_answers(self, user_id, attempt_id, source_lang, target_lang, questions, correct, level):
+        # Saving the same attempt twice is a no-op (primary key attempt_id, position)
+        attempt_id = attempt_id or uuid.uuid4().hex
+        now = time.time()
+        pair = f"{source_lang}-{target_lang}"
+        rows = [(attempt_id, position, user_id, pair, q.get('item_id'), q.get('level') or level,
+                 q.get('type'), int(ok), now)
+                for position, (q, ok) in enumerate(zip(questions, correct))]
+        self.store.execute_many_deferred(INSERT_EVENT, rows)
+
+    def _query(self, sql, params=()):
+        with self.store.reader() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def user_levels(self, user_id=None):
+        sql = 'SELECT user_id, pair, item_level, answers, correct, first_answered_at, last_answered_at FROM user_stats'
+        if user_id is None:
+            return self._query(sql)
+        return self._query(sql + ' WHERE user_id = ?', (user_id,))
+
+    def estimate_level(self, user_id, questions=(), correct=(), level=LEVELS[0]):
+        # Level from the user's whole history, plus answers that are not saved yet
+        frame = self.user_levels(user_id)[['user_id', 'item_level', 'answers', 'correct']]
+        if len(questions):
+            pending = pd.DataFrame({'user_id': user_id,
+                                    'item_level': [q.get('level') or level for q in questions],
+                                    'answers': 1, 'correct': np.asarray(correct, dtype=int)})
+            frame = pd.concat([frame, pending], ignore_index=True) if len(frame) else pending
+        return estimate_levels(frame).get(user_id, LEVELS[0])
+
+    @traced("analytics.user_summary")
+    def user_summary(self):
+        levels = self.user_levels()
+        users = levels.groupby('user_id').agg(answers=('answers', 'sum'), correct=('correct', 'sum'),
+                                              first_answered_at=('first_answered_at', 'min'),
+                                              last_answered_at=('last_answered_at', 'max'))
+        users['accuracy'] = users['correct'] / users['answers']
+        users['estimated_level'] = estimate_levels(levels)
+        return users.reset_index()
+
+    @traced("analytics.item_difficulty")
+    def item_difficulty(self, pair=None, min_answers=1):
+        # Hardest first. difficulty is the smoothed error rate; the prior is the overall accuracy
+        sql = 'SELECT pair, item_id, item_level, question_type, answers, correct FROM item_stats'
+        items = self._query(sql + ' WHERE pair = ?', (pair,)) if pair else self._query(sql)
+        if items.empty:
+            return items.assign(accuracy=[], difficulty=[])
+        prior = items['correct'].sum() / items['answers'].sum()
+        items['accuracy'] = items['correct'] / items['answers']
+        items['difficulty'] = 1 - smoothed_accuracy(items['correct'], items['answers'], prior)
+        items = items[items['answers'] >= min_answers]
+        return items.sort_values('difficulty', ascending=False, ignore_index=True)
+
+    @traced("analytics.cohorts")
+    def cohorts(self, now=None):
+        # Learners grouped by the week of their first answer
+        users = self.user_summary()
+        if users.empty:
+            return users
+        now = now or time.time()
+        users['cohort'] = pd.to_datetime(users['first_answered_at'], unit='s').dt.to_period('W').dt.start_time.dt.date
+        users['active'] = users['last_answered_at'] >= now - 7 * DAY
+        table = users.groupby('cohort').agg(learners=('user_id', 'size'), answers=('answers', 'sum'),
+                                            correct=('correct', 'sum'), active_last_7_days=('active', 'mean'))
+        table['accuracy'] = table['correct'] / table['answers']
+        levels = pd.crosstab(users['cohort'], users['estimated_level']).reindex(columns=LEVELS, fill_value=0)
+        return table.drop(columns='correct').join(levels).reset_index()
+
+    def overview(self):
+        with self.store.reader() as conn:
+            row = conn.execute(
+                'SELECT COUNT(DISTINCT user_id), COALESCE(SUM(answers), 0), COALESCE(SUM(correct), 0) FROM user_stats'
+            ).fetchone()
+        return {'learners': row[0], 'answers': row[1], 'accuracy': row[2] / row[1] if row[1] else None}
+
+
+_analytics = None
+_analytics_lock = threading.Lock()
+
+
+def get_analytics():
+    global _analytics
+    if _analytics is None:
+        with _analytics_lock:
+            if _analytics is None:
+                from progress_store import get_store
+                _analytics = Analytics(get_store())
+    return _analytics
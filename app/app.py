@@ -1,11 +1,17 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
-from transformers import MarianMTModel, MarianTokenizer
-import spacy
-import language_tool_python
-from nlp_utils import translate_text, analyze_grammar, correct_text
-from exercises import generate_quiz
+# Model calls go to the inference server when LINGUALEARN_INFERENCE_URL is set, otherwise run in-process
+from inference_client import (translate_text, translate_document, analyze_grammar_incremental,
+                              correct_text_incremental, startup_report, supported_languages,
+                              is_translation_error, is_analysis_error, is_correction_error)
+from exercises import quiz_prefetcher, record_quiz_answers
+from analytics import get_analytics, higher_level, score_answers
+from session_cache import SessionCache, run_once, session_cached
+from live_translation import get_live_translator
+from progress_store import get_store
+from metrics_server import start_metrics_server
+import tracing
+import os
 import uuid
 
 # Initialize session state
@@ -29,40 +35,58 @@ if 'quiz_score' not in st.session_state:
     st.session_state.quiz_score = 0
 if 'quiz_total' not in st.session_state:
     st.session_state.quiz_total = 0
+if 'quiz_id' not in st.session_state:
+    st.session_state.quiz_id = None
 
-# Database setup
-def init_db():
-    conn = sqlite3.connect('lingualearn.db')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users 
-                (user_id TEXT, level TEXT, progress INTEGER, last_quiz_score INTEGER)''')
-    conn.commit()
-    conn.close()
+# Prometheus /metrics endpoint, started once per process
+if os.environ.get('LINGUALEARN_METRICS_PORT'):
+    start_metrics_server()
 
-init_db()
+# Optional: generate exercises from the NLP models in the background (see exercise_factory.py)
+if os.environ.get('LINGUALEARN_EXERCISE_FACTORY'):
+    from exercise_factory import start_background_factory
+    start_background_factory()
 
-# Save user progress
-def save_progress(user_id, level, progress, quiz_score):
-    conn = sqlite3.connect('lingualearn.db')
-    c = conn.cursor()
-    c.execute('INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?)',
-              (user_id, level, progress, quiz_score))
-    conn.commit()
-    conn.close()
+# Every widget interaction reruns this script; results already computed for this session are reused
+cached_translate = session_cached(translate_text, keep=lambda text: not is_translation_error(text))
+cached_analysis = session_cached(analyze_grammar_incremental, keep=lambda result: not is_analysis_error(result))
+cached_correction = session_cached(correct_text_incremental, keep=lambda result: not is_correction_error(result))
+document_translations = SessionCache('translate_document')
+live_translator = get_live_translator()
+
+
+def prefetch_translation():
+    # on_change callback: Streamlit reports the text only when an edit is committed (Ctrl+Enter,
+    # leaving the box) or a language changes, not per keystroke; translation starts in the background
+    if st.session_state.get('live_translation') and not st.session_state.get('document_mode'):
+        live_translator.submit(st.session_state.user_id, st.session_state.get('user_input', ''),
+                               st.session_state.get('source_lang'), st.session_state.get('target_lang'))
+
+# Progress store (schema is created or migrated on first use)
+progress_store = get_store()
+analytics = get_analytics()
 
 # Main app
 st.title("LinguaLearn AI 🌍")
 st.write("Interactive Language Learning Platform")
 
-# Language selection
+# Language selection (every language reachable through the translation models)
+languages = ["English", "French", "Arabic"]
+languages += [lang for lang in supported_languages() if lang not in languages]
 col1, col2 = st.columns(2)
 with col1:
-    source_lang = st.selectbox("Source Language", ["English", "French", "Arabic"])
+    source_lang = st.selectbox("Source Language", languages, key='source_lang', on_change=prefetch_translation)
 with col2:
-    target_lang = st.selectbox("Target Language", ["English", "French", "Arabic"])
+    target_lang = st.selectbox("Target Language", languages, key='target_lang', on_change=prefetch_translation)
 
 # Text input
-user_input = st.text_area("Enter a sentence to translate and analyze:")
+user_input = st.text_area("Enter a sentence to translate and analyze:", key='user_input',
+                          on_change=prefetch_translation)
+
+# Long texts are translated sentence by sentence and shown as they are ready
+document_mode = st.checkbox("Document mode (long texts)", key='document_mode')
+# Short texts are translated in the background as soon as they are entered
+live_mode = st.checkbox("Live translation", key='live_translation', on_change=prefetch_translation)
 
 # Translation section with dedicated button
 col1, col2 = st.columns([1, 3])
@@ -73,26 +97,46 @@ with col2:
 
 # Display translation when button is clicked
 if translate_button and user_input:
-    with st.spinner("Translating..."):
-        translation = translate_text(user_input, source_lang, target_lang)
-        st.session_state.translation = translation
+    request = (user_input, source_lang, target_lang)
+    if document_mode and request not in document_translations:
+        placeholder = st.empty()
+        translated_sentences = []
+        for sentence in translate_document(user_input, source_lang, target_lang):
+            translated_sentences.append(sentence)
+            placeholder.markdown(" ".join(translated_sentences))
+        st.session_state.translation = " ".join(translated_sentences)
+        if not any(is_translation_error(sentence) for sentence in translated_sentences):
+            document_translations.put(request, st.session_state.translation)
+        placeholder.empty()
+    elif document_mode:
+        st.session_state.translation = document_translations.get(request)
+    else:
+        with st.spinner("Translating..."):
+            # Already translated (or still translating) in live mode? Then no second model call
+            translation = live_translator.result(user_input, source_lang, target_lang) if live_mode else None
+            if translation is None or is_translation_error(translation):
+                translation = cached_translate(user_input, source_lang, target_lang)
+            st.session_state.translation = translation
 
 # Translation result field
 if st.session_state.translation:
     st.subheader("Translation")
     st.text_area("Translated text:", value=st.session_state.translation, height=100, disabled=True)
 
-# Grammar analysis and correction only when analyze button is clicked
+# Grammar analysis and correction once the analyze button is clicked. The results stay on screen
+# on later reruns (served from the session cache) until the text or the language changes
 if analyze_button and user_input:
+    st.session_state.analysis_request = (user_input, source_lang)
+if user_input and st.session_state.get('analysis_request') == (user_input, source_lang):
     # Grammar analysis
     with st.spinner("Analyzing grammar..."):
-        grammar_analysis = analyze_grammar(user_input, source_lang)
+        grammar_analysis = cached_analysis(user_input, source_lang)
     st.subheader("Grammar Analysis")
     st.write(grammar_analysis)
     
     # Text correction
     with st.spinner("Checking for errors..."):
-        corrected_text, corrections = correct_text(user_input, source_lang)
+        corrected_text, corrections = cached_correction(user_input, source_lang)
     st.subheader("Corrections")
     if corrections:
         st.write(f"Corrected: {corrected_text}")
@@ -110,8 +154,11 @@ if not st.session_state.quiz_active:
     if st.button("Generate Quiz"):
         st.session_state.quiz_active = True
         st.session_state.quiz_submitted = False
-        # Generate quiz questions with debugging
-        quiz_questions = generate_quiz(st.session_state.level, source_lang, target_lang)
+        st.session_state.quiz_id = str(uuid.uuid4())
+        # Usually prefetched in the background (see the end of this section)
+        quiz_questions = quiz_prefetcher.take(st.session_state.user_id, st.session_state.level,
+                                              source_lang, target_lang, user_id=st.session_state.user_id)
+        st.session_state.quiz_languages = (source_lang, target_lang)
         st.session_state.quiz_questions = quiz_questions
         st.session_state.quiz_total = len(quiz_questions)
         
@@ -161,17 +208,21 @@ if st.session_state.quiz_active:
             
             submitted = st.form_submit_button("Submit Quiz")
             
-            # Handle quiz submission
-            if submitted:
+            # Handle quiz submission; submitting the same quiz again changes nothing
+            if submitted and run_once('record_quiz', st.session_state.quiz_id):
                 st.session_state.quiz_submitted = True
-                score = 0
+                questions = st.session_state.quiz_questions
+                correct = score_answers(questions, answers)
+                st.session_state.quiz_score = int(correct.sum())
                 
-                # Only count non-empty answers
-                for i, q in enumerate(st.session_state.quiz_questions):
-                    if answers[i] == q['correct_answer']:
-                        score += 1
+                # Level from the whole answer history, this quiz included (before it is saved)
+                st.session_state.estimated_level = analytics.estimate_level(
+                    st.session_state.user_id, questions, correct, st.session_state.level)
                 
-                st.session_state.quiz_score = score
+                # Schedule the next review of each word and store the answers
+                quiz_source, quiz_target = st.session_state.get('quiz_languages', (source_lang, target_lang))
+                record_quiz_answers(st.session_state.user_id, quiz_source, quiz_target, questions, answers,
+                                    attempt_id=st.session_state.quiz_id, level=st.session_state.level)
                 st.rerun()  # Updated from experimental_rerun
 
     # Display results after submission (outside the form)
@@ -180,19 +231,21 @@ if st.session_state.quiz_active:
         total = st.session_state.quiz_total
         score_percentage = (score / total) * 100 if total > 0 else 0
         
-        # Update progress
-        old_progress = st.session_state.progress
-        st.session_state.progress = min(old_progress + 10, 100)  # Add fixed 10% progress per quiz
-        
-        # Update level based on score
-        if score_percentage > 80:
-            st.session_state.level = "Advanced"
-        elif score_percentage > 50:
-            st.session_state.level = "Intermediate"
-        
-        # Save to database
-        save_progress(st.session_state.user_id, st.session_state.level, 
-                     st.session_state.progress, score_percentage)
+        # Progress, level and the database are updated once per quiz, not on every rerun
+        first_display = run_once('reward_quiz', st.session_state.quiz_id)
+        if first_display:
+            st.session_state.progress_before_quiz = st.session_state.progress
+            st.session_state.progress = min(st.session_state.progress + 10, 100)  # Add fixed 10% progress per quiz
+            
+            # Update level from the answer history; it never goes down
+            st.session_state.level = higher_level(st.session_state.level,
+                                                  st.session_state.get('estimated_level', st.session_state.level))
+            
+            # Save to database
+            progress_store.save_progress(st.session_state.user_id, st.session_state.level,
+                                         st.session_state.progress, score_percentage,
+                                         attempt_id=st.session_state.quiz_id)
+        old_progress = st.session_state.progress_before_quiz
         
         # Display results with animation
         st.success(f"Your score: {score}/{total} ({score_percentage:.0f}%)")
@@ -203,7 +256,8 @@ if st.session_state.quiz_active:
         
         # Display rating with stars
         if score_percentage == 100:
-            st.balloons()
+            if first_display:
+                st.balloons()
             st.markdown("### Rating: ⭐⭐⭐⭐⭐")
             st.markdown("**Excellent!** Perfect score! You've mastered this level.")
         elif score_percentage >= 80:
@@ -242,11 +296,62 @@ if st.session_state.quiz_active:
             st.session_state.quiz_submitted = False
             st.rerun()  # Updated from experimental_rerun
 
+# Start on the next quiz while the learner reads, so "Generate Quiz" returns at once. This runs
+# after the results above, so it sees the updated level and the answers just recorded
+if not st.session_state.quiz_active or st.session_state.quiz_submitted:
+    quiz_prefetcher.prefetch(st.session_state.user_id, st.session_state.level, source_lang, target_lang,
+                             user_id=st.session_state.user_id)
+
 # Progress tracking
 st.subheader("Your Progress")
 st.progress(st.session_state.progress / 100)
 st.write(f"Current Level: {st.session_state.level}")
 
+# Learners grouped by the week they started, computed from the aggregate tables. Class-wide data,
+# so only shown where LINGUALEARN_CLASS_ANALYTICS is set (e.g. a teacher's deployment)
+if os.environ.get('LINGUALEARN_CLASS_ANALYTICS'):
+    @st.cache_data(ttl=int(os.environ.get('LINGUALEARN_ANALYTICS_TTL_SECONDS', '300')), show_spinner=False)
+    def class_analytics():
+        # Shared by every session and recomputed at most once per ttl, not on every rerun
+        overview = analytics.overview()
+        if not overview['answers']:
+            return overview, None, None
+        return overview, analytics.cohorts().round(2), analytics.item_difficulty(min_answers=5).head(10).round(2)
+
+    with st.expander("Class analytics"):
+        overview, cohorts, hardest = class_analytics()
+        if overview['answers']:
+            columns = st.columns(3)
+            columns[0].metric("Learners", overview['learners'])
+            columns[1].metric("Answers", overview['answers'])
+            columns[2].metric("Accuracy", f"{overview['accuracy']:.0%}")
+            st.write("Cohorts (week of first quiz)")
+            st.dataframe(cohorts, hide_index=True)
+            st.write("Hardest words")
+            st.dataframe(hardest, hide_index=True)
+        else:
+            st.write("No quiz answers recorded yet.")
+
+# What has been loaded so far and how long it took
+with st.sidebar.expander("System status"):
+    report = [row for row in startup_report() if row['status'] != 'not loaded']
+    if report:
+        st.dataframe(pd.DataFrame(report), hide_index=True)
+    else:
+        st.write("No models loaded yet.")
+
+# Admin panel with the slowest operations (only when tracing is on)
+if tracing.enabled():
+    with st.sidebar.expander("Performance"):
+        operations = tracing.summary()
+        if operations:
+            st.write("Time spent per operation")
+            st.dataframe(pd.DataFrame(operations).round(1), hide_index=True)
+            st.write("Slowest operations")
+            st.dataframe(pd.DataFrame(tracing.slowest(10)).drop(columns=['at']).round(1), hide_index=True)
+        else:
+            st.write("Nothing traced yet.")
+
 # Feedback form
 with st.form("feedback_form"):
     st.subheader("Feedback")
@@ -0,0 +1,254 @@
+"""Offline bulk processing: translate, analyze and correct large text files.
+
+Examples:
+    python batch_pipeline.py lessons.txt lessons.fr.jsonl --source English --target French
+    python batch_pipeline.py essays.csv graded.jsonl --text-field essay --source French \\
+        --stages analyze,correct --workers correct=4
+    python batch_pipeline.py lessons.txt lessons.fr.jsonl --source English --target French --resume
+
+Records are read and written as a stream, so memory stays bounded. Progress is
+checkpointed after every chunk; --resume continues an interrupted run. A record
+a stage failed on gets an error field instead of a result, the run exits with
+status 1, and --resume starts again from the first failed record.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+from collections import deque
+from functools import partial
+
+STAGES = ('translate', 'analyze', 'correct')
+# Set instead of the stage's result when it failed for that record
+ERROR_FIELDS = ('translation_error', 'analysis_error', 'correction_error')
+
+
+# Input
+
+def read_records(path, text_field='text'):
+    # Yields dicts with at least a 'text' key, in file order
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, encoding='utf-8', newline='') as f:
+        if extension == '.jsonl':
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    record['text'] = record.get(text_field, '')
+                    yield record
+        elif extension == '.csv':
+            for row in csv.DictReader(f):
+                row['text'] = row.get(text_field, '')
+                yield row
+        else:
+            for line in f:
+                line = line.rstrip('\n')
+                if line.strip():
+                    yield {'text': line}
+
+
+def chunked(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# Stages (top-level so worker processes can run them)
+
+def run_stage(stage, options, chunk):
+    import nlp_utils
+    texts = [record['text'] for record in chunk]
+    if stage == 'translate':
+        for record, translation in zip(chunk, nlp_utils.translate_batch(texts, options['source'], options['target'])):
+            if nlp_utils.is_translation_error(translation):
+                record['translation_error'] = translation
+            else:
+                record['translation'] = translation
+    elif stage == 'analyze':
+        try:
+            tokens = nlp_utils.analyze_grammar_batch(texts, options['language'])
+        except ValueError as e:
+            for record in chunk:
+                record['analysis_error'] = str(e)
+        else:
+            for record in chunk:
+                record['analysis'] = []
+            for token in tokens:
+                chunk[token.pop('text_id')]['analysis'].append(token)
+    elif stage == 'correct':
+        for record, (corrected, corrections) in zip(chunk, nlp_utils.correct_text_batch(texts, options['language'])):
+            if nlp_utils.is_correction_error((corrected, corrections)):
+                record['correction_error'] = corrections[0]
+            else:
+                record['corrected'] = corrected
+                record['corrections'] = corrections
+    return chunk
+
+
+def bounded_map(pool, fn, chunks, max_in_flight):
+    # Like pool.imap, but never reads more than max_in_flight chunks ahead
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.apply_async(fn, (chunk,)))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def build_pipeline(chunks, stages, options, workers, pools):
+    # Chains one generator per stage; stages with workers run in their own process pool
+    for stage in stages:
+        fn = partial(run_stage, stage, options)
+        count = workers.get(stage, 0)
+        if count > 1:
+            pool = multiprocessing.Pool(count)
+            pools.append(pool)
+            chunks = bounded_map(pool, fn, chunks, max_in_flight=2 * count)
+        else:
+            chunks = map(fn, chunks)
+    return chunks
+
+
+# Checkpoints
+
+def checkpoint_path(output):
+    return output + '.checkpoint'
+
+
+def load_checkpoint(output):
+    try:
+        with open(checkpoint_path(output), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def input_hash(path):
+    # Identifies the input by content, so an edited or replaced file is not resumed
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def resume_mismatch(checkpoint, run_state, output):
+    # Why the checkpoint cannot be resumed, or None if it can
+    for key in ('input', 'input_hash', 'stages', 'options'):
+        if checkpoint.get(key) != run_state[key]:
+            return f"the {key.replace('_', ' ')} changed"
+    try:
+        if os.path.getsize(output) < checkpoint['output_bytes']:
+            return "the output file is shorter than the checkpoint"
+    except OSError:
+        return "the output file is missing"
+    return None
+
+
+def save_checkpoint(output, state):
+    tmp = checkpoint_path(output) + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp, checkpoint_path(output))
+
+
+def parse_workers(value):
+    workers = {}
+    for part in filter(None, (value or '').split(',')):
+        stage, _, count = part.partition('=')
+        if stage not in STAGES:
+            raise argparse.ArgumentTypeError(f"Unknown stage: {stage}")
+        workers[stage] = int(count)
+    return workers
+
+
+def run(args):
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    for stage in stages:
+        if stage not in STAGES:
+            raise SystemExit(f"Unknown stage: {stage} (choose from {', '.join(STAGES)})")
+    if 'translate' in stages and not args.target:
+        raise SystemExit("--target is required for the translate stage")
+    options = {'source': args.source, 'target': args.target, 'language': args.language or args.source,
+               'text_field': args.text_field}
+    run_state = {'input': os.path.abspath(args.input), 'input_hash': input_hash(args.input), 'stages': stages,
+                 'options': options}
+
+    skip = 0
+    mode = 'w'
+    checkpoint = load_checkpoint(args.output) if args.resume else None
+    mismatch = resume_mismatch(checkpoint, run_state, args.output) if checkpoint else None
+    if checkpoint and not mismatch:
+        skip = checkpoint['records']
+        mode = 'r+'
+        print(f"Resuming after {skip} records")
+    elif checkpoint:
+        print(f"Not resuming because {mismatch}; starting from the beginning")
+    elif args.resume:
+        print("No checkpoint for this output; starting from the beginning")
+
+    records = read_records(args.input, args.text_field)
+    for _ in range(skip):
+        next(records, None)
+
+    pools = []
+    processed = skip
+    failed = 0
+    try:
+        with open(args.output, mode, encoding='utf-8') as out:
+            if mode == 'r+':
+                # Drop anything written after the last checkpoint
+                out.seek(checkpoint['output_bytes'])
+                out.truncate()
+            results = build_pipeline(chunked(records, args.chunk_size), stages, options, parse_workers(args.workers), pools)
+            for chunk in results:
+                done = None
+                for record in chunk:
+                    if failed == 0 and any(field in record for field in ERROR_FIELDS):
+                        # The checkpoint stays before the first failed record, so --resume retries it
+                        done = {'records': processed, 'output_bytes': out.tell()}
+                    failed += any(field in record for field in ERROR_FIELDS)
+                    out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    processed += 1
+                out.flush()
+                os.fsync(out.fileno())
+                if done is not None:
+                    save_checkpoint(args.output, {**run_state, **done})
+                elif failed == 0:
+                    save_checkpoint(args.output, {**run_state, 'records': processed, 'output_bytes': out.tell()})
+                print(f"\r{processed} records", end='', file=sys.stderr, flush=True)
+        print(f"\nDone: {processed} records written to {args.output}", file=sys.stderr)
+        if failed:
+            raise SystemExit(f"{failed} records failed (see the *_error fields); rerun with --resume to retry them")
+        os.remove(checkpoint_path(args.output))
+    finally:
+        for pool in pools:
+            pool.terminate()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0], epilog=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='.txt (one text per line), .jsonl or .csv file')
+    parser.add_argument('output', help='JSONL file with one result per input record')
+    parser.add_argument('--source', default='English', help='language of the input texts')
+    parser.add_argument('--target', help='target language for the translate stage')
+    parser.add_argument('--language', help='language for analyze/correct (defaults to --source)')
+    parser.add_argument('--stages', default='translate', help='comma-separated: translate,analyze,correct')
+    parser.add_argument('--text-field', default='text', help='field or column holding the text (JSONL/CSV)')
+    parser.add_argument('--chunk-size', type=int, default=64, help='records processed together')
+    parser.add_argument('--workers', default='', help='worker processes per stage, e.g. translate=2,correct=4')
+    parser.add_argument('--resume', action='store_true', help='continue from the last checkpoint')
+    run(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    main()
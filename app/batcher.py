@@ -0,0 +1,104 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import tracing
+
+# How long the batcher waits for more requests before running a batch
+DEFAULT_WINDOW_MS = float(os.environ.get('LINGUALEARN_BATCH_WINDOW_MS', '5'))
+DEFAULT_MAX_BATCH_SIZE = int(os.environ.get('LINGUALEARN_MAX_BATCH_SIZE', '32'))
+
+
+class MicroBatcher:
+    """Collects concurrent requests that share a key and runs them as one batch.
+
+    `process_fn(key, items)` must return one result per item, in order.
+    Every caller gets a Future that resolves to its own result. If a batch
+    raises, its items are run again one at a time, so only the callers whose
+    own item fails get the exception. Spans opened by process_fn are added to
+    each caller's trace (see tracing.attach).
+    """
+
+    def __init__(self, process_fn, window_ms=DEFAULT_WINDOW_MS, max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+        self._process_fn = process_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.retried = 0
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread.start()
+
+    def submit(self, key, item):
+        future = Future()
+        self._ensure_started()
+        self._queue.put((key, item, future, tracing.current()))
+        return future
+
+    def _collect(self):
+        # Block for the first request, then keep collecting until the window closes
+        pending = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(pending) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            groups = {}
+            for key, item, future, trace in pending:
+                groups.setdefault(key, []).append((item, future, trace))
+
+            for key, entries in groups.items():
+                # Skip requests whose caller already gave up
+                entries = [entry for entry in entries if entry[1].set_running_or_notify_cancel()]
+                if not entries:
+                    continue
+                try:
+                    self._process(key, entries)
+                except Exception as e:
+                    if len(entries) == 1:
+                        entries[0][1].set_exception(e)
+                        continue
+                    # One bad item must not fail everyone batched with it: run each item on its own
+                    self.retried += 1
+                    for entry in entries:
+                        try:
+                            self._process(key, [entry])
+                        except Exception as e:
+                            entry[1].set_exception(e)
+
+    def _process(self, key, entries):
+        with tracing.attach([trace for _, _, trace in entries]):
+            results = self._process_fn(key, [item for item, _, _ in entries])
+        self.batches += 1
+        self.items += len(entries)
+        for (_, future, _), result in zip(entries, results):
+            future.set_result(result)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'avg_batch_size': self.items / self.batches if self.batches else 0.0,
+            'retried': self.retried,
+            'queued': self._queue.qsize(),
+        }
@@ -0,0 +1,122 @@
+"""Convert translation models for a faster CPU backend and check their quality.
+
+Examples:
+    python convert_models.py --backend ctranslate2 English-French French-English
+    python convert_models.py --backend onnx all
+    python convert_models.py --backend mmap all
+    python convert_models.py --backend quantized English-Arabic --verify-only
+
+Each converted model is compared with the PyTorch baseline on sample sentences.
+The command fails if the average similarity is below --tolerance.
+"""
+import argparse
+import difflib
+import sys
+import time
+
+from translation_backends import BACKENDS, converted_path, create_backend, export_mmap_weights
+
+# Sample sentences per source language, used when no --samples file is given
+SAMPLES = {
+    'English': ["Hello, how are you?", "I am learning a new language.", "The book is on the table.",
+                "Thank you for your help with this exercise.", "We will travel to Paris next summer."],
+    'French': ["Bonjour, comment allez-vous ?", "J'apprends une nouvelle langue.", "Le livre est sur la table.",
+               "Merci pour votre aide avec cet exercice.", "Nous irons à Paris l'été prochain."],
+    'Arabic': ["مرحبا، كيف حالك؟", "أنا أتعلم لغة جديدة.", "الكتاب على الطاولة.",
+               "شكرا على مساعدتك في هذا التمرين.", "سنسافر إلى باريس الصيف المقبل."],
+}
+
+
+def convert(backend, model_name):
+    path = converted_path(backend, model_name)
+    if backend == 'ctranslate2':
+        import ctranslate2
+        ctranslate2.converters.TransformersConverter(model_name).convert(path, quantization='int8', force=True)
+    elif backend == 'onnx':
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True).save_pretrained(path)
+    elif backend == 'mmap':
+        export_mmap_weights(model_name)
+    else:
+        return None  # pytorch and quantized work straight from the Hugging Face model
+    return path
+
+
+def similarity(reference, candidate):
+    # chrF when sacrebleu is installed, otherwise a character-level match ratio (both 0..1)
+    try:
+        from sacrebleu.metrics import CHRF
+        return CHRF().sentence_score(candidate, [reference]).score / 100
+    except ImportError:
+        return difflib.SequenceMatcher(None, reference, candidate).ratio()
+
+
+def timed_translate(backend, sentences):
+    backend.translate(sentences[:1])  # warm-up
+    start = time.perf_counter()
+    outputs = backend.translate(sentences)
+    return outputs, (time.perf_counter() - start) / len(sentences)
+
+
+def verify(backend_name, model_name, sentences):
+    baseline = create_backend(model_name, 'pytorch')
+    reference, baseline_latency = timed_translate(baseline, sentences)
+    baseline_size = baseline.size_bytes()
+    del baseline
+
+    candidate = create_backend(model_name, backend_name)
+    outputs, latency = timed_translate(candidate, sentences)
+    scores = [similarity(r, c) for r, c in zip(reference, outputs)]
+    return {
+        'similarity': sum(scores) / len(scores),
+        'baseline_ms': baseline_latency * 1000,
+        'backend_ms': latency * 1000,
+        'baseline_mb': baseline_size / (1024 * 1024),
+        'backend_mb': candidate.size_bytes() / (1024 * 1024),
+    }
+
+
+def main(argv=None):
+    from nlp_utils import model_names
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0], epilog=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pairs', nargs='+', help="language pairs from model_names (e.g. English-French) or 'all'")
+    parser.add_argument('--backend', required=True, choices=[b for b in BACKENDS if b != 'pytorch'])
+    parser.add_argument('--samples', help='text file with one sample sentence per line')
+    parser.add_argument('--tolerance', type=float, default=0.9,
+                        help='minimum average similarity to the PyTorch output (0..1)')
+    parser.add_argument('--verify-only', action='store_true', help='skip conversion')
+    args = parser.parse_args(argv)
+
+    pairs = list(model_names) if 'all' in args.pairs else args.pairs
+    failed = []
+    for pair in pairs:
+        if pair not in model_names:
+            parser.error(f"Unknown language pair: {pair}")
+        model_name = model_names[pair]
+        if not args.verify_only:
+            path = convert(args.backend, model_name)
+            if path:
+                print(f"{pair}: converted {model_name} -> {path}")
+
+        if args.samples:
+            with open(args.samples, encoding='utf-8') as f:
+                sentences = [line.strip() for line in f if line.strip()]
+        else:
+            sentences = SAMPLES[pair.split('-')[0]]
+        result = verify(args.backend, model_name, sentences)
+        ok = result['similarity'] >= args.tolerance
+        print(f"{pair}: similarity {result['similarity']:.3f} (tolerance {args.tolerance}) | "
+              f"latency {result['baseline_ms']:.0f} -> {result['backend_ms']:.0f} ms/sentence | "
+              f"weights {result['baseline_mb']:.0f} -> {result['backend_mb']:.0f} MB | {'OK' if ok else 'FAILED'}")
+        if not ok:
+            failed.append(pair)
+
+    if failed:
+        print(f"Quality below tolerance for: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
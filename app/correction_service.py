@@ -0,0 +1,125 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from lazy_resources import LazyResource
+from tracing import span
+
+# Number of LanguageTool instances per language. With LINGUALEARN_LT_SERVER set,
+# the instances are HTTP clients of that one local server instead of separate JVMs
+POOL_SIZE = int(os.environ.get('LINGUALEARN_LT_POOL_SIZE', '1'))
+LOCAL_SERVER = os.environ.get('LINGUALEARN_LT_SERVER') or None
+BATCH_WORKERS = int(os.environ.get('LINGUALEARN_LT_WORKERS', '4'))
+
+
+def create_languagetool(code, remote_server=None):
+    import language_tool_python
+    if remote_server:
+        return language_tool_python.LanguageTool(code, remote_server=remote_server)
+    return language_tool_python.LanguageTool(code)
+
+
+class PooledTool:
+    def __init__(self, name, loader):
+        self.resource = LazyResource(name, loader)
+        self.name = name
+        self.in_flight = 0
+        self.checks = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def stats(self):
+        return {
+            'instance': self.name,
+            'status': self.resource.status,
+            'queue_depth': self.in_flight,
+            'checks': self.checks,
+            'errors': self.errors,
+            'avg_ms': 1000 * self.total_seconds / self.checks if self.checks else 0.0,
+            'max_ms': 1000 * self.max_seconds,
+        }
+
+
+class CorrectionService:
+    """Spreads LanguageTool `check` calls over a pool of instances per language.
+
+    Each call goes to the instance with the fewest requests in flight.
+    `check_many` and `check_async` let callers check many texts at once.
+    """
+
+    def __init__(self, language_codes, pool_size=POOL_SIZE, remote_server=LOCAL_SERVER,
+                 workers=BATCH_WORKERS, factory=create_languagetool):
+        self._lock = threading.Lock()
+        self.pools = {}
+        for language, code in language_codes.items():
+            self.pools[language] = [
+                PooledTool(f"LanguageTool {code} #{i + 1}", self._loader(factory, code, remote_server))
+                for i in range(max(1, pool_size))
+            ]
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='languagetool')
+
+    @staticmethod
+    def _loader(factory, code, remote_server):
+        return lambda: factory(code, remote_server)
+
+    def available(self, language):
+        # Loads the first instance if needed; the others start when they are first picked
+        pool = self.pools.get(language)
+        return bool(pool) and pool[0].resource.get() is not None
+
+    def _acquire(self, language):
+        pool = self.pools[language]
+        with self._lock:
+            # Prefer an idle instance that is not loaded yet over queueing on a busy one
+            instance = min(pool, key=lambda p: (p.in_flight, p.resource.status == 'failed'))
+            instance.in_flight += 1
+        return instance
+
+    def check(self, text, language):
+        if language not in self.pools:
+            raise ValueError(f"Text correction not available for {language}")
+        instance = self._acquire(language)
+        start = time.perf_counter()
+        try:
+            tool = instance.resource.get()
+            if tool is None:
+                # Fall back to any instance that did load
+                tool = next((p.resource.get() for p in self.pools[language] if p.resource.status == 'loaded'), None)
+            if tool is None:
+                raise RuntimeError(f"LanguageTool is not available for {language}")
+            with span("languagetool.check", language=language, instance=instance.name):
+                return tool.check(text)
+        except Exception:
+            instance.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                instance.in_flight -= 1
+                instance.checks += 1
+                instance.total_seconds += elapsed
+                instance.max_seconds = max(instance.max_seconds, elapsed)
+
+    def check_many(self, texts, language):
+        # Matches for each text, in order. Each check runs in a copy of the caller's context,
+        # so its span is a stage of the caller's trace
+        futures = [self._executor.submit(contextvars.copy_context().run, self.check, text, language)
+                   for text in texts]
+        return [future.result() for future in futures]
+
+    async def check_async(self, text, language):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, contextvars.copy_context().run, self.check, text, language)
+
+    def warm_up(self):
+        for pool in self.pools.values():
+            for instance in pool:
+                instance.resource.get()
+
+    def stats(self):
+        with self._lock:
+            return {language: [instance.stats() for instance in pool] for language, pool in self.pools.items()}
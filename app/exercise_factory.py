@@ -0,0 +1,172 @@
+"""Generate quiz exercises ahead of time from the NLP models.
+
+Examples:
+    python exercise_factory.py                      # every language pair and level
+    python exercise_factory.py --pairs English-French,French-English --levels Beginner
+    python exercise_factory.py --corpus lessons.json --refresh
+
+Fill-in-the-blank exercises blank a verb found by spaCy's POS tagger, with
+verbs from other sentences as wrong options. Translation exercises translate
+whole sentences, with the translations of other sentences as wrong options.
+Results go to the exercise store (exercises.db), where generate_quiz picks
+them up. Sentences come from data/sentences.json: {language: {level: [...]}}.
+Model calls go through inference_client, so with LINGUALEARN_INFERENCE_URL set
+they run on the inference server.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+
+from exercise_store import get_exercise_store
+from inference_client import (SERVER_UNAVAILABLE, UNSUPPORTED_PAIR, analyze_grammar_batch, is_translation_error,
+                              supported_languages, translate_batch)
+from vocabulary_bank import LEVELS
+
+SENTENCES_PATH = os.environ.get('LINGUALEARN_SENTENCES',
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sentences.json'))
+VERB_TAGS = ('VERB', 'AUX')
+
+
+def load_corpus(path=SENTENCES_PATH):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def exercise_id(kind, *parts):
+    return f"gen-{kind}-" + hashlib.sha1('\x00'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def _wrong_options(answer, candidates, rng, k=3):
+    seen = {answer.lower()}
+    unique = []
+    for candidate in candidates:
+        if candidate.lower() not in seen:
+            seen.add(candidate.lower())
+            unique.append(candidate)
+    return rng.sample(unique, min(k, len(unique)))
+
+
+def fill_blank_exercises(sentences, language, level):
+    records = analyze_grammar_batch(sentences, language)
+    if records is None:
+        raise RuntimeError(SERVER_UNAVAILABLE)
+    tokens_by_text = {}
+    for record in records:
+        tokens_by_text.setdefault(record['text_id'], []).append(record)
+
+    verbs = {}  # text_id -> the verb to blank, main verbs before auxiliaries
+    for text_id, tokens in tokens_by_text.items():
+        candidates = [t for t in tokens if t['pos'] in VERB_TAGS and t['word'].isalpha()]
+        candidates.sort(key=lambda t: VERB_TAGS.index(t['pos']))
+        if candidates:
+            verbs[text_id] = candidates[0]['word']
+
+    exercises = []
+    for text_id, verb in verbs.items():
+        sentence = sentences[text_id]
+        blanked, found = re.subn(rf'(?<!\w){re.escape(verb)}(?!\w)', '___', sentence, count=1)
+        if not found:
+            continue
+        ex_id = exercise_id('fill', language, sentence, verb)
+        wrong = _wrong_options(verb, [v for i, v in verbs.items() if i != text_id], random.Random(ex_id))
+        if len(wrong) < 2:
+            continue
+        exercises.append({
+            'id': ex_id, 'type': 'fill_blank', 'source_lang': language, 'target_lang': language, 'level': level,
+            'question': f'Complete the sentence in {language}: "{blanked}"',
+            'options': [verb] + wrong, 'correct_answer': verb, 'source_text': sentence,
+        })
+    return exercises
+
+
+def translation_exercises(sentences, source_lang, target_lang, level):
+    pairs = [(s, t) for s, t in zip(sentences, translate_batch(sentences, source_lang, target_lang))
+             if not is_translation_error(t) and t != UNSUPPORTED_PAIR]
+    exercises = []
+    for i, (sentence, translation) in enumerate(pairs):
+        ex_id = exercise_id('translate', source_lang, target_lang, sentence)
+        wrong = _wrong_options(translation, [t for j, (_, t) in enumerate(pairs) if j != i], random.Random(ex_id))
+        if len(wrong) < 2:
+            continue
+        exercises.append({
+            'id': ex_id, 'type': 'sentence_translation', 'source_lang': source_lang, 'target_lang': target_lang,
+            'level': level, 'question': f'Translate "{sentence}" from {source_lang} to {target_lang}:',
+            'options': [translation] + wrong, 'correct_answer': translation, 'source_text': sentence,
+        })
+    return exercises
+
+
+class ExerciseFactory:
+    def __init__(self, store=None, corpus=None):
+        self.store = store or get_exercise_store()
+        self.corpus = corpus if corpus is not None else load_corpus()
+
+    def jobs(self, pairs=None, levels=LEVELS, refresh=False):
+        # (type, source, target, level) combinations that still need exercises
+        if pairs is None:
+            # Every language the models reach; pairs with no route produce no exercises
+            available = set(supported_languages())
+            languages = [language for language in self.corpus if language in available]
+            pairs = [(s, t) for s in languages for t in languages if s != t]
+        languages = sorted({language for pair in pairs for language in pair})
+        wanted = [('fill_blank', language, language, level) for language in languages for level in levels]
+        wanted += [('sentence_translation', source, target, level) for source, target in pairs for level in levels]
+        return [job for job in wanted
+                if self.corpus.get(job[1], {}).get(job[3]) and (refresh or not self.store.count(*job))]
+
+    def run(self, jobs):
+        added = 0
+        for kind, source, target, level in jobs:
+            sentences = self.corpus[source][level]
+            try:
+                if kind == 'fill_blank':
+                    exercises = fill_blank_exercises(sentences, source, level)
+                else:
+                    exercises = translation_exercises(sentences, source, target, level)
+            except Exception as e:
+                print(f"Warning: Could not generate {kind} exercises for {source}-{target} {level}: {e}")
+                continue
+            added += self.store.add_many(exercises)
+        return added
+
+
+_background = None
+_background_lock = threading.Lock()
+
+
+def start_background_factory():
+    # Fills the missing combinations once, in a daemon thread; one per process
+    global _background
+    with _background_lock:
+        if _background is None:
+            factory = ExerciseFactory()
+            _background = threading.Thread(target=lambda: factory.run(factory.jobs()),
+                                           name='exercise-factory', daemon=True)
+            _background.start()
+    return _background
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0], epilog=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pairs', help='comma-separated language pairs, e.g. English-French (default: all)')
+    parser.add_argument('--levels', default=','.join(LEVELS))
+    parser.add_argument('--corpus', default=SENTENCES_PATH, help='JSON file {language: {level: [sentences]}}')
+    parser.add_argument('--refresh', action='store_true', help='also run combinations that already have exercises')
+    args = parser.parse_args(argv)
+
+    pairs = [tuple(pair.split('-', 1)) for pair in args.pairs.split(',')] if args.pairs else None
+    factory = ExerciseFactory(corpus=load_corpus(args.corpus))
+    jobs = factory.jobs(pairs, args.levels.split(','), args.refresh)
+    print(f"{len(jobs)} combinations to generate")
+    print(f"Added {factory.run(jobs)} exercises")
+    for key, count in factory.store.stats().items():
+        print(f"  {key}: {count}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+STORE_PATH = os.environ.get('LINGUALEARN_EXERCISE_DB',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exercises.db'))
+
+# How often the in-memory index checks the database for exercises added by another process
+REFRESH_SECONDS = float(os.environ.get('LINGUALEARN_EXERCISE_REFRESH_SECONDS', '30'))
+
+FIELDS = ('id', 'type', 'source_lang', 'target_lang', 'level', 'question', 'options', 'correct_answer',
+          'source_text')
+
+
+class ExerciseStore:
+    """Exercises made ahead of time by the exercise factory, in SQLite.
+
+    All exercises are loaded into an in-memory index by
+    (type, source language, target language, level), so picking one for a
+    quiz does not query the exercises. At most every `refresh_seconds` the
+    store asks SQLite whether another process (e.g. the exercise_factory.py
+    command line) has committed since, and reloads the index if so.
+    Fill-in-the-blank exercises use the same language as source and target.
+    """
+
+    def __init__(self, path=STORE_PATH, refresh_seconds=REFRESH_SECONDS):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._conn = None
+        self._index = None  # (type, source_lang, target_lang, level) -> [exercise]
+        self._ids = set()
+        self._data_version = None
+        self._checked_at = 0.0
+
+    def _db(self):
+        if self._conn is None and self.path:
+            try:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('''CREATE TABLE IF NOT EXISTS exercises
+                                (id TEXT PRIMARY KEY, type TEXT NOT NULL, source_lang TEXT NOT NULL,
+                                 target_lang TEXT NOT NULL, level TEXT NOT NULL, question TEXT NOT NULL,
+                                 options TEXT NOT NULL, correct_answer TEXT NOT NULL, source_text TEXT,
+                                 created_at REAL)''')
+                conn.execute('''CREATE INDEX IF NOT EXISTS idx_exercises_key
+                                ON exercises(type, source_lang, target_lang, level)''')
+                conn.commit()
+                self._conn = conn
+            except sqlite3.Error as e:
+                print(f"Warning: Exercise store disabled on disk: {e}")
+                self.path = None
+        return self._conn
+
+    def _load(self):
+        # Called with the lock held
+        if self._index is not None:
+            if self._conn is None or time.monotonic() - self._checked_at < self.refresh_seconds:
+                return
+            self._checked_at = time.monotonic()
+            # data_version changes only when another connection commits
+            if self._conn.execute('PRAGMA data_version').fetchone()[0] == self._data_version:
+                return
+        self._index = {}
+        self._ids = set()
+        conn = self._db()
+        if conn is None:
+            return
+        self._checked_at = time.monotonic()
+        self._data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        for row in conn.execute(f"SELECT {', '.join(FIELDS)} FROM exercises ORDER BY created_at"):
+            exercise = dict(zip(FIELDS, row))
+            exercise['options'] = json.loads(exercise['options'])
+            self._add(exercise)
+
+    def _add(self, exercise):
+        self._ids.add(exercise['id'])
+        key = (exercise['type'], exercise['source_lang'], exercise['target_lang'], exercise['level'])
+        self._index.setdefault(key, []).append(exercise)
+
+    def add_many(self, exercises):
+        now = time.time()
+        with self._lock:
+            self._load()
+            new = [e for e in exercises if e['id'] not in self._ids]
+            conn = self._db()
+            if conn is not None and new:
+                with conn:
+                    conn.executemany(
+                        f"INSERT OR IGNORE INTO exercises ({', '.join(FIELDS)}, created_at) "
+                        f"VALUES ({', '.join('?' * (len(FIELDS) + 1))})",
+                        [tuple(json.dumps(e[f], ensure_ascii=False) if f == 'options' else e.get(f)
+                               for f in FIELDS) + (now,) for e in new])
+            for exercise in new:
+                self._add(exercise)
+            return len(new)
+
+    def items(self, kind, source_lang, target_lang, level):
+        with self._lock:
+            self._load()
+            return self._index.get((kind, source_lang, target_lang, level), [])
+
+    def sample(self, kind, source_lang, target_lang, level, k=1):
+        items = self.items(kind, source_lang, target_lang, level)
+        return random.sample(items, min(k, len(items)))
+
+    def count(self, kind, source_lang, target_lang, level):
+        return len(self.items(kind, source_lang, target_lang, level))
+
+    def stats(self):
+        with self._lock:
+            self._load()
+            return {f"{kind} {source}-{target} {level}": len(items)
+                    for (kind, source, target, level), items in sorted(self._index.items())}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_exercise_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ExerciseStore()
+    return _store
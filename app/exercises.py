@@ -1,193 +1,184 @@
 import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from vocabulary_bank import get_bank
+from exercise_store import get_exercise_store
+from srs import get_scheduler
+from analytics import get_analytics, score_answers
+from tracing import traced
 
-def generate_quiz(level, source_lang, target_lang):
-    # Language-specific vocabulary with proper translations
-    vocabulary = {
-        'English': {
-            'Hello': {'French': 'Bonjour', 'Arabic': 'مرحبا'},
-            'Book': {'French': 'Livre', 'Arabic': 'كتاب'},
-            'Thank you': {'French': 'Merci', 'Arabic': 'شكرا'},
-            'Yes': {'French': 'Oui', 'Arabic': 'نعم'},
-            'No': {'French': 'Non', 'Arabic': 'لا'},
-            'Goodbye': {'French': 'Au revoir', 'Arabic': 'وداعا'},
-            'I am learning': {'French': 'J\'apprends', 'Arabic': 'أنا أتعلم'},
-            'The book is on the table': {'French': 'Le livre est sur la table', 'Arabic': 'الكتاب على الطاولة'},
-        },
-        'French': {
-            'Bonjour': {'English': 'Hello', 'Arabic': 'مرحبا'},
-            'Livre': {'English': 'Book', 'Arabic': 'كتاب'},
-            'Merci': {'English': 'Thank you', 'Arabic': 'شكرا'},
-            'Oui': {'English': 'Yes', 'Arabic': 'نعم'},
-            'Non': {'English': 'No', 'Arabic': 'لا'},
-            'Au revoir': {'English': 'Goodbye', 'Arabic': 'وداعا'},
-            'J\'apprends': {'English': 'I am learning', 'Arabic': 'أنا أتعلم'},
-            'Le livre est sur la table': {'English': 'The book is on the table', 'Arabic': 'الكتاب على الطاولة'},
-        },
-        'Arabic': {
-            'مرحبا': {'English': 'Hello', 'French': 'Bonjour'},
-            'كتاب': {'English': 'Book', 'French': 'Livre'},
-            'شكرا': {'English': 'Thank you', 'French': 'Merci'},
-            'نعم': {'English': 'Yes', 'French': 'Oui'},
-            'لا': {'English': 'No', 'French': 'Non'},
-            'وداعا': {'English': 'Goodbye', 'French': 'Au revoir'},
-            'أنا أتعلم': {'English': 'I am learning', 'French': 'J\'apprends'},
-            'الكتاب على الطاولة': {'English': 'The book is on the table', 'French': 'Le livre est sur la table'},
-        }
+# Used when the bank has nothing for the requested target language
+DEFAULT_WRONG_OPTIONS = {
+    'English': ["House", "Car", "Tree"],
+    'French': ["Maison", "Voiture", "Arbre"],
+    'Arabic': ["بيت", "سيارة", "شجرة"],
+}
+
+def _fallback_question(target_lang):
+    # Generic question for language pairs without vocabulary
+    return {
+        'question': f'Which word means "Hello" in {target_lang}?',
+        'options': ['Bonjour' if target_lang == 'French' else 'مرحبا' if target_lang == 'Arabic' else 'Hello',
+                   'Merci' if target_lang == 'French' else 'شكرا' if target_lang == 'Arabic' else 'Thank you',
+                   'Au revoir' if target_lang == 'French' else 'وداعا' if target_lang == 'Arabic' else 'Goodbye'],
+        'correct_answer': 'Bonjour' if target_lang == 'French' else 'مرحبا' if target_lang == 'Arabic' else 'Hello'
+    }
+
+def translation_question(item, source_lang, target_lang, bank=None):
+    bank = bank or get_bank()
+    word = item['translations'][source_lang]
+    correct_answer = item['translations'][target_lang]
+
+    # Wrong options come from the word's precomputed distractor pool
+    wrong_options = bank.distractors(correct_answer, target_lang)
+    if not wrong_options:
+        wrong_options = DEFAULT_WRONG_OPTIONS.get(target_lang, DEFAULT_WRONG_OPTIONS['Arabic'])
+
+    # Create question with context
+    context = ""
+    if len(word.split()) > 1:  # It's a phrase
+        context = f" (in a conversation)"
+
+    return {
+        'question': f'Translate "{word}" from {source_lang} to {target_lang}{context}:',
+        'options': [correct_answer] + wrong_options,
+        'correct_answer': correct_answer,
+        'item_id': item['id'],
+        'level': item.get('level'),
+        'type': 'translation'
+    }
+
+def fill_blank_question(entry, target_lang):
+    # First option is always correct
+    return {
+        'question': f'Complete the sentence in {target_lang}: "{entry["sentence"]}"',
+        'options': list(entry['options']),  # Copy to avoid modifying the bank
+        'correct_answer': entry['options'][0],
+        'item_id': entry['id'],
+        'level': entry.get('level'),
+        'type': 'fill_blank'
     }
-    
-    # Different question types
-    question_types = [
-        "translation",  # Basic translation
-        "fill_blank",   # Fill in the blank
-        "match"         # Match the word to its meaning
-    ]
-    
+
+def generated_question(exercise):
+    # Exercises from the exercise factory are stored in question form already
+    return {
+        'question': exercise['question'],
+        'options': list(exercise['options']),
+        'correct_answer': exercise['correct_answer'],
+        'item_id': exercise['id'],
+        'level': exercise['level'],
+        'type': exercise['type']
+    }
+
+@traced("generate_quiz")
+def generate_quiz(level, source_lang, target_lang, user_id=None):
+    bank = get_bank()
+
     # If source language vocabulary is not available, default to English
-    if source_lang not in vocabulary:
+    if not bank.has_language(source_lang):
         source_lang = "English"
-    
-    # Get appropriate words based on level
-    if level == "Beginner":
-        word_count = 5  # Use first 5 words for beginners
-        question_types = ["translation"]  # Only simple translations for beginners
-    elif level == "Intermediate":
-        word_count = 7  # Use more words for intermediate
-    else:  # Advanced
-        word_count = len(vocabulary[source_lang])  # Use all words
-    
-    # Select a subset of words based on level
-    source_words = list(vocabulary[source_lang].keys())[:word_count]
-    
-    # Generate questions
+
+    # Generate questions: 2 translation questions for every level. With a user, the
+    # spaced-repetition scheduler picks due reviews first, then unseen words
+    if user_id is not None:
+        selected = get_scheduler().next_items(user_id, source_lang, target_lang, level, 2)
+    else:
+        # Words allowed at this level (Beginner < Intermediate < Advanced), indexed per language pair
+        items = bank.items_for(source_lang, target_lang, level)
+        selected = random.sample(items, min(2, len(items)))
+
     questions = []
-    for question_type in question_types:
-        if question_type == "translation" and len(questions) < 3:  # Limit to 3 translation questions
-            # Create translation questions - ensure we get at least some words
-            sample_words = random.sample(source_words, min(2, len(source_words)))
-            
-            # Debug check - if no words, add some defaults
-            if not sample_words:
-                if source_lang == "English":
-                    sample_words = ["Hello", "Thank you"]
-                elif source_lang == "French":
-                    sample_words = ["Bonjour", "Merci"]
-                else:  # Arabic or other
-                    sample_words = ["مرحبا", "شكرا"]
-            
-            for word in sample_words:
-                # First check if this word has a translation
-                if target_lang in vocabulary.get(source_lang, {}).get(word, {}):
-                    correct_answer = vocabulary[source_lang][word][target_lang]
-                    
-                    # Get wrong options from target language vocabulary
-                    target_vocab = list(vocabulary.get(target_lang, {}).keys())
-                    if not target_vocab:  # If no vocab available
-                        if target_lang == "English":
-                            wrong_options = ["House", "Car", "Tree"]
-                        elif target_lang == "French":
-                            wrong_options = ["Maison", "Voiture", "Arbre"]
-                        else:  # Arabic or other
-                            wrong_options = ["بيت", "سيارة", "شجرة"]
-                    else:
-                        # Filter out the correct answer if it's in the list
-                        wrong_options_pool = [w for w in target_vocab if str(w) != str(correct_answer)]
-                        wrong_options = random.sample(wrong_options_pool, min(3, len(wrong_options_pool)))
-                    
-                    # Create question with context
-                    context = ""
-                    if len(word.split()) > 1:  # It's a phrase
-                        context = f" (in a conversation)"
-                    
-                    questions.append({
-                        'question': f'Translate "{word}" from {source_lang} to {target_lang}{context}:',
-                        'options': [correct_answer] + wrong_options,
-                        'correct_answer': correct_answer
-                    })
-                else:
-                    # Fallback for missing translation - create a generic question
-                    questions.append({
-                        'question': f'Which word means "Hello" in {target_lang}?',
-                        'options': ['Bonjour' if target_lang == 'French' else 'مرحبا' if target_lang == 'Arabic' else 'Hello', 
-                                   'Merci' if target_lang == 'French' else 'شكرا' if target_lang == 'Arabic' else 'Thank you',
-                                   'Au revoir' if target_lang == 'French' else 'وداعا' if target_lang == 'Arabic' else 'Goodbye'],
-                        'correct_answer': 'Bonjour' if target_lang == 'French' else 'مرحبا' if target_lang == 'Arabic' else 'Hello'
-                    })
-    
+    for item in selected:
+        questions.append(translation_question(item, source_lang, target_lang, bank))
+
+    # One whole-sentence translation made ahead of time, when the exercise factory has run
+    store = get_exercise_store()
+    for exercise in store.sample('sentence_translation', source_lang, target_lang, level):
+        questions.append(generated_question(exercise))
+
     # Always ensure we have at least one question
     if not questions:
-        questions.append({
-            'question': f'Which word means "Hello" in {target_lang}?',
-            'options': ['Bonjour' if target_lang == 'French' else 'مرحبا' if target_lang == 'Arabic' else 'Hello', 
-                       'Merci' if target_lang == 'French' else 'شكرا' if target_lang == 'Arabic' else 'Thank you',
-                       'Au revoir' if target_lang == 'French' else 'وداعا' if target_lang == 'Arabic' else 'Goodbye'],
-            'correct_answer': 'Bonjour' if target_lang == 'French' else 'مرحبا' if target_lang == 'Arabic' else 'Hello'
-        })
-    
+        questions.append(_fallback_question(target_lang))
+
     # If we need more questions, add fill-in-the-blank for intermediate/advanced
     if level != "Beginner" and len(questions) < 4:
-        # Add fill-in-the-blank questions for intermediate and advanced levels
-        sentences = {
-            'English': [
-                "I ___ going to the store",
-                "She ___ a new book yesterday",
-                "They ___ learning a new language",
-                "Please ___ me with this exercise"
-            ],
-            'French': [
-                "Je ___ à la bibliothèque",
-                "Elle ___ un nouveau livre",
-                "Ils ___ une nouvelle langue",
-                "S'il vous plaît, ___ moi avec cet exercice"
-            ],
-            'Arabic': [
-                "أنا ___ إلى المتجر",
-                "هي ___ كتابًا جديدًا بالأمس",
-                "هم ___ لغة جديدة",
-                "من فضلك ___ في هذا التمرين"
-            ]
-        }
-        
-        fill_options = {
-            'English': {
-                'am': ['am', 'is', 'are', 'be'],
-                'bought': ['bought', 'buy', 'buys', 'buying'],
-                'are': ['are', 'is', 'am', 'be'],
-                'help': ['help', 'assist', 'aid', 'support']
-            },
-            'French': {
-                'vais': ['vais', 'va', 'allons', 'allez'],
-                'achète': ['achète', 'achetez', 'achètes', 'achètent'],
-                'apprennent': ['apprennent', 'apprend', 'apprenons', 'apprenez'],
-                'aidez': ['aidez', 'aide', 'aident', 'aidons']
-            },
-            'Arabic': {
-                'أذهب': ['أذهب', 'تذهب', 'يذهب', 'نذهب'],
-                'اشترت': ['اشترت', 'اشترى', 'تشتري', 'يشتري'],
-                'يتعلمون': ['يتعلمون', 'يتعلم', 'تتعلم', 'نتعلم'],
-                'ساعدني': ['ساعدني', 'ساعد', 'يساعد', 'تساعد']
-            }
-        }
-        
-        # Select a sentence for the target language
-        if len(sentences.get(target_lang, [])) > 0:
-            # Pick a random sentence index
-            idx = random.randint(0, min(3, len(sentences[target_lang])-1))
-            sentence = sentences[target_lang][idx]
-            
-            # Get the corresponding word options
-            word_key = list(fill_options[target_lang].keys())[idx]
-            options = fill_options[target_lang][word_key]
-            correct_answer = options[0]  # First option is always correct
-            
-            # Create the question
-            questions.append({
-                'question': f'Complete the sentence in {target_lang}: "{sentence}"',
-                'options': options.copy(),  # Copy to avoid modifying original
-                'correct_answer': correct_answer
-            })
-    
+        fill_blanks = bank.fill_blanks_for(target_lang, level)
+        generated = store.items('fill_blank', target_lang, target_lang, level)
+        # Hand-written and generated sentences are equally likely to be picked
+        pick = random.randrange(len(fill_blanks) + len(generated)) if fill_blanks or generated else None
+        if pick is not None and pick < len(fill_blanks):
+            questions.append(fill_blank_question(fill_blanks[pick], target_lang))
+        elif pick is not None:
+            questions.append(generated_question(generated[pick - len(fill_blanks)]))
+
     # Randomize the order of options for each question
     for q in questions:
         random.shuffle(q['options'])
-    
-    return questions
\ No newline at end of file
+
+    return questions
+
+@traced("record_quiz_answers")
+def record_quiz_answers(user_id, source_lang, target_lang, questions, answers, attempt_id=None, level=None):
+    # Feeds translation answers back to the spaced-repetition scheduler and stores every
+    # answer for analytics. Returns one bool per question
+    correct = score_answers(questions, answers)
+    scheduler = get_scheduler()
+    for q, ok in zip(questions, correct):
+        if q.get('type') == 'translation':
+            scheduler.record_answer(user_id, source_lang, target_lang, q['item_id'], bool(ok))
+    get_analytics().record_answers(user_id, attempt_id, source_lang, target_lang, questions, correct, level)
+    return correct
+
+
+class QuizPrefetcher:
+    """Generates each session's next quiz in the background.
+
+    `prefetch` starts generating as soon as the settings of the next quiz are
+    known; `take` returns it (waiting if it is still being made) or, when the
+    settings have changed since, generates a new one on the spot.
+    """
+
+    def __init__(self, workers=2, max_sessions=1000):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='quiz-prefetch')
+        self._pending = OrderedDict()  # session -> (quiz settings, Future)
+        self._lock = threading.Lock()
+        self.max_sessions = max_sessions
+        self.hits = 0
+        self.misses = 0
+
+    def prefetch(self, session_id, level, source_lang, target_lang, user_id=None):
+        settings = (level, source_lang, target_lang, user_id)
+        with self._lock:
+            entry = self._pending.get(session_id)
+            if entry is not None and entry[0] == settings:
+                self._pending.move_to_end(session_id)
+                return
+            if entry is not None:
+                entry[1].cancel()
+            self._pending[session_id] = (settings, self._executor.submit(generate_quiz, *settings))
+            self._pending.move_to_end(session_id)
+            while len(self._pending) > self.max_sessions:
+                _, (_, stale) = self._pending.popitem(last=False)
+                stale.cancel()
+
+    def take(self, session_id, level, source_lang, target_lang, user_id=None):
+        settings = (level, source_lang, target_lang, user_id)
+        with self._lock:
+            entry = self._pending.pop(session_id, None)
+        if entry is not None and entry[0] == settings and not entry[1].cancelled():
+            try:
+                quiz = entry[1].result()
+                self.hits += 1
+                return quiz
+            except Exception as e:
+                print(f"Warning: Prefetched quiz failed: {e}")
+        self.misses += 1
+        return generate_quiz(*settings)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'pending': len(self._pending)}
+
+
+quiz_prefetcher = QuizPrefetcher()
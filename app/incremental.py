@@ -0,0 +1,115 @@
+import copy
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# Sentences kept per cache; a long essay is a few hundred sentences
+SENTENCE_CACHE_ITEMS = int(os.environ.get('LINGUALEARN_SENTENCE_CACHE_ITEMS', '20000'))
+
+# A sentence ends at end punctuation (Latin or Arabic) followed by whitespace or the end of
+# the text, or at a line break, so "example.com" and "3.5" stay whole. nlp_utils.split_sentences
+# uses the same boundaries when spaCy has no sentence splitter
+SENTENCE_END = re.compile(r'[.!?\u061F\u06D4]+(?=\s|$)|\n')
+# Words whose trailing period does not end a sentence ("Dr. Smith"); single capitals are initials
+ABBREVIATIONS = frozenset({
+    'dr', 'mr', 'mrs', 'ms', 'prof', 'st', 'jr', 'sr', 'sra', 'srta', 'vs', 'etc', 'e.g', 'i.e', 'cf', 'no',
+    'mt', 'fig', 'approx', 'dept', 'm', 'mme', 'mlle', 'hr', 'fr', 'bzw', 'z.b', 'd.h', 'usw', 'sig', 'dott',
+})
+
+
+def _is_abbreviation(text, end):
+    # The word just before the period at text[end]
+    start = end
+    while start > 0 and not text[start - 1].isspace() and end - start < 12:
+        start -= 1
+    word = text[start:end].lstrip('(\'"\u201c\u00ab')
+    return word.lower() in ABBREVIATIONS or (len(word) == 1 and word.isupper())
+
+
+def _add_span(spans, text, start, end):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start < end:
+        spans.append((start, end))
+
+
+def sentence_spans(text):
+    # (start, end) of every non-blank sentence, so results can be mapped back into the text
+    spans = []
+    start = 0
+    for m in SENTENCE_END.finditer(text):
+        if m.group() == '.' and _is_abbreviation(text, m.start()):
+            continue
+        _add_span(spans, text, start, m.end())
+        start = m.end()
+    _add_span(spans, text, start, len(text))
+    return spans
+
+
+def sentence_key(language, sentence):
+    return hashlib.sha1(f"{language}\x00{sentence}".encode('utf-8')).hexdigest()
+
+
+class SentenceCache:
+    """Bounded LRU of per-sentence results, keyed by a hash of (language, sentence)."""
+
+    def __init__(self, max_items=SENTENCE_CACHE_ITEMS):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'items': len(self._items)}
+
+
+def process_incrementally(text, language, cache, process_many):
+    """Runs `process_many(sentences)` only on sentences missing from `cache`.
+
+    Returns a list of (span, result) for every sentence of the text, in order.
+    """
+    spans = sentence_spans(text)
+    keys = [sentence_key(language, text[start:end]) for start, end in spans]
+    results = [cache.get(key) for key in keys]
+
+    changed = {}
+    for i, result in enumerate(results):
+        if result is None:
+            changed.setdefault(keys[i], []).append(i)
+    if changed:
+        first = [indices[0] for indices in changed.values()]
+        fresh = process_many([text[spans[i][0]:spans[i][1]] for i in first])
+        for key, result in zip(changed, fresh):
+            cache.put(key, result)
+            for i in changed[key]:
+                results[i] = result
+    return list(zip(spans, results))
+
+
+def shift_match(match, delta):
+    # LanguageTool offsets are relative to the checked sentence; move them into the full text
+    shifted = copy.copy(match)
+    shifted.offset = match.offset + delta
+    return shifted
@@ -0,0 +1,321 @@
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+from incremental import sentence_spans
+
+# With LINGUALEARN_INFERENCE_URL set (http://host:port or unix:///path/to.sock) the
+# app sends model calls to inference_server.py; otherwise nlp_utils runs in-process
+INFERENCE_URL = os.environ.get('LINGUALEARN_INFERENCE_URL', '')
+TIMEOUT = float(os.environ.get('LINGUALEARN_INFERENCE_TIMEOUT', '30'))
+# Run the call locally when the server cannot be reached at all; models then load in this process.
+# Off by default: a busy (503) or slow server is never bypassed, so its backpressure holds
+FALLBACK = os.environ.get('LINGUALEARN_INFERENCE_FALLBACK', '0').lower() in ('1', 'true', 'yes')
+# After a connection failure, skip the server for this many seconds instead of waiting on every call
+RETRY_AFTER_SECONDS = 10.0
+# Request bodies are kept below the server's MAX_BODY_BYTES; larger inputs are sent in pieces
+MAX_REQUEST_BYTES = 512 * 1024
+
+SERVER_UNAVAILABLE = "Error: the inference server is not available, try again later."
+UNSUPPORTED_PAIR = "Translation not supported for this language pair"  # as nlp_utils.UNSUPPORTED_PAIR
+
+
+class InferenceUnavailable(Exception):
+    # The server could not be reached; the call may run in-process instead
+    fallback = True
+
+
+class InferenceFailed(InferenceUnavailable):
+    # The server answered with an error, was busy or too slow; never retried in-process
+    fallback = False
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class InferenceClient:
+    def __init__(self, url=INFERENCE_URL, timeout=TIMEOUT, fallback=FALLBACK):
+        self.url = url
+        self.timeout = timeout
+        self.fallback = fallback
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+        self.remote_calls = 0
+        self.fallback_calls = 0
+        self.failures = 0
+
+    @property
+    def remote(self):
+        return bool(self.url)
+
+    def _connection(self, timeout):
+        parts = urlsplit(self.url)
+        if parts.scheme == 'unix':
+            return UnixHTTPConnection(parts.path, timeout)
+        if parts.scheme == 'https':
+            return http.client.HTTPSConnection(parts.netloc, timeout=timeout)
+        return http.client.HTTPConnection(parts.netloc, timeout=timeout)
+
+    def request(self, method, path, payload=None, timeout=None):
+        if time.monotonic() < self._down_until:
+            raise InferenceUnavailable("inference server marked down")
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        connection = self._connection(timeout or self.timeout)
+        try:
+            connection.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            data = response.read()
+        except TimeoutError as e:
+            # Reached but slow: the server is working through its queue, not down
+            with self._lock:
+                self.failures += 1
+            raise InferenceFailed(f"inference server timed out: {e}") from e
+        except (OSError, http.client.HTTPException) as e:
+            with self._lock:
+                self.failures += 1
+                self._down_until = time.monotonic() + RETRY_AFTER_SECONDS
+            raise InferenceUnavailable(str(e)) from e
+        finally:
+            connection.close()
+        if response.status != 200:
+            with self._lock:
+                self.failures += 1
+            try:
+                error = json.loads(data).get('error')
+            except (ValueError, AttributeError):
+                error = None
+            raise InferenceFailed(f"inference server returned {response.status}: {error or response.reason}")
+        with self._lock:
+            self.remote_calls += 1
+        return json.loads(data)
+
+    def call(self, remote, local, unavailable):
+        # remote() talks to the server, local() runs nlp_utils in-process
+        if self.remote:
+            try:
+                return remote()
+            except InferenceUnavailable as e:
+                if not (self.fallback and e.fallback):
+                    print(f"Warning: inference server request failed: {e}")
+                    return unavailable
+        with self._lock:
+            if self.remote:
+                self.fallback_calls += 1
+        return local()
+
+    def stats(self):
+        with self._lock:
+            return {'url': self.url or 'in-process', 'remote_calls': self.remote_calls,
+                    'fallback_calls': self.fallback_calls, 'failures': self.failures,
+                    'server_down': time.monotonic() < self._down_until}
+
+
+client = InferenceClient()
+
+
+def _local():
+    import nlp_utils
+    return nlp_utils
+
+
+def _encoded_size(value):
+    return len(json.dumps(value))
+
+
+def _pieces(text, limit=MAX_REQUEST_BYTES // 2):
+    """Splits text at sentence boundaries into consecutive pieces that each fit in a request.
+
+    ''.join(pieces) == text. A single sentence over the limit is cut by length.
+    """
+    if _encoded_size(text) <= limit:
+        return [text]
+    bounds = [0] + [start for start, _ in sentence_spans(text)][1:] + [len(text)]
+    pieces = []
+    piece_start, size = 0, 0
+    for start, end in zip(bounds, bounds[1:]):
+        cost = _encoded_size(text[start:end])
+        if start > piece_start and size + cost > limit:
+            pieces.append(text[piece_start:start])
+            piece_start, size = start, 0
+        size += cost
+    pieces.append(text[piece_start:])
+    return _cut(pieces, limit)
+
+
+def _cut(pieces, limit):
+    # Hard cut for pieces still over the limit (one very long sentence); \uXXXX escapes take 6 bytes
+    result = []
+    for piece in pieces:
+        step = max(1, limit // 6)
+        result.extend([piece] if _encoded_size(piece) <= limit else
+                      [piece[i:i + step] for i in range(0, len(piece), step)])
+    return result
+
+
+def _groups(texts, limit=MAX_REQUEST_BYTES // 2):
+    # Consecutive runs of texts whose JSON fits in one request
+    group, size = [], 0
+    for text in texts:
+        cost = _encoded_size(text) + 2
+        if group and size + cost > limit:
+            yield group
+            group, size = [], 0
+        group.append(text)
+        size += cost
+    if group:
+        yield group
+
+
+def _translate_remote(texts, source_lang, target_lang):
+    translations = []
+    for group in _groups(texts):
+        if len(group) == 1 and _encoded_size(group[0]) > MAX_REQUEST_BYTES // 2:
+            # One text too large for a request: translate its sentences in pieces and join them
+            pieces = _translate_remote(_pieces(group[0]), source_lang, target_lang)
+            translations.append(' '.join(piece.strip() for piece in pieces))
+            continue
+        translations.extend(client.request('POST', '/translate', {'texts': group, 'source_lang': source_lang,
+                                                                  'target_lang': target_lang})['translations'])
+    return translations
+
+
+def translate_text(text, source_lang, target_lang):
+    return client.call(
+        lambda: _translate_remote([text], source_lang, target_lang)[0],
+        lambda: _local().translate_text(text, source_lang, target_lang),
+        SERVER_UNAVAILABLE)
+
+
+def is_translation_error(text):
+    # Messages returned in place of a translation, worth retrying later (see nlp_utils.is_translation_error)
+    return text == SERVER_UNAVAILABLE or text.startswith(("ERROR: ", "Translation error: "))
+
+
+def translate_batch(texts, source_lang, target_lang):
+    return client.call(
+        lambda: _translate_remote(list(texts), source_lang, target_lang),
+        lambda: _local().translate_batch(texts, source_lang, target_lang),
+        [SERVER_UNAVAILABLE] * len(texts))
+
+
+def translate_document(text, source_lang, target_lang, batch_size=16):
+    # Same contract as nlp_utils.translate_document: translated sentences, one batch at a time
+    def split_remote():
+        return [sentence for piece in _pieces(text)
+                for sentence in client.request('POST', '/split', {'text': piece, 'language': source_lang})['sentences']]
+    sentences = client.call(
+        split_remote,
+        lambda: _local().split_sentences(text, source_lang),
+        None)
+    if sentences is None:
+        yield SERVER_UNAVAILABLE
+        return
+    for start in range(0, len(sentences), batch_size):
+        yield from translate_batch(sentences[start:start + batch_size], source_lang, target_lang)
+
+
+def _analyze(text, language, incremental):
+    def remote():
+        # Pieces end at sentence boundaries, and the analysis has one line per token
+        analyses = [client.request('POST', '/analyze', {'text': piece, 'language': language,
+                                                        'incremental': incremental})['analysis']
+                    for piece in _pieces(text)]
+        errors = [analysis for analysis in analyses if is_analysis_error(analysis)]
+        return errors[0] if errors else '\n'.join(analysis for analysis in analyses if analysis)
+    return client.call(
+        remote,
+        lambda: (_local().analyze_grammar_incremental if incremental else _local().analyze_grammar)(text, language),
+        SERVER_UNAVAILABLE)
+
+
+def analyze_grammar_batch(texts, language):
+    # Token records for every text (see nlp_utils.analyze_grammar_batch); None when the server is down
+    def remote():
+        records = []
+        offset = 0
+        for group in _groups(list(texts)):
+            for record in client.request('POST', '/tokens', {'texts': group, 'language': language})['tokens']:
+                record['text_id'] += offset
+                records.append(record)
+            offset += len(group)
+        return records
+    return client.call(
+        remote,
+        lambda: _local().analyze_grammar_batch(texts, language),
+        None)
+
+
+def is_analysis_error(analysis):
+    # See nlp_utils.is_analysis_error
+    return analysis == SERVER_UNAVAILABLE or analysis.startswith(("Error during grammar analysis: ",
+                                                                  "Grammar analysis not available"))
+
+
+def analyze_grammar(text, language):
+    return _analyze(text, language, False)
+
+
+def analyze_grammar_incremental(text, language):
+    return _analyze(text, language, True)
+
+
+def _correct(text, language, incremental):
+    def remote():
+        corrected, corrections = [], []
+        for piece in _pieces(text):
+            result = client.request('POST', '/correct', {'text': piece, 'language': language,
+                                                         'incremental': incremental})
+            corrected.append(result['corrected'])
+            corrections.extend(result['corrections'])
+        return ''.join(corrected), corrections
+    return client.call(
+        remote,
+        lambda: (_local().correct_text_incremental if incremental else _local().correct_text)(text, language),
+        (text, [SERVER_UNAVAILABLE]))
+
+
+def is_correction_error(result):
+    # See nlp_utils.is_correction_error
+    return any(c == SERVER_UNAVAILABLE
+               or c.startswith(("Error during text correction: ", "Text correction not available"))
+               for c in result[1])
+
+
+def correct_text(text, language):
+    return _correct(text, language, False)
+
+
+def correct_text_incremental(text, language):
+    return _correct(text, language, True)
+
+
+def startup_report():
+    return client.call(lambda: client.request('GET', '/status', timeout=5)['resources'],
+                       lambda: _local().startup_report(), [])
+
+
+_languages = None
+
+
+def supported_languages():
+    # Fixed for the lifetime of the server, so asked once
+    global _languages
+    if _languages is None:
+        languages = client.call(lambda: client.request('GET', '/languages', timeout=5)['languages'],
+                                lambda: _local().supported_languages(), None)
+        if languages is None:
+            return []
+        _languages = languages
+    return _languages
@@ -0,0 +1,356 @@
+"""Standalone inference server for the NLP functions in nlp_utils.
+
+    python inference_server.py --port 8600
+    python inference_server.py --unix-socket /tmp/lingualearn.sock
+    python inference_server.py --processes 4 --preload all
+
+The Streamlit app talks to it through inference_client.py when
+LINGUALEARN_INFERENCE_URL is set, so UI replicas do not load any models.
+Requests wait in a bounded queue per operation (503 when full), and
+translation requests arriving together are run as one batch.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import signal
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+import nlp_utils
+import tracing
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+def _require(payload, *keys):
+    # Checked before queueing, so a malformed request gets a 400 instead of reaching a worker
+    for key in keys:
+        if not isinstance(payload.get(key), str):
+            raise ValueError(f"'{key}' must be a string")
+
+
+class Job:
+    __slots__ = ('payload', 'future')
+
+    def __init__(self, payload, future):
+        self.payload = payload
+        self.future = future
+
+
+class InferenceServer:
+    def __init__(self, workers=4, max_queue=256, batch_window_ms=5.0, max_batch=32):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch = max_batch
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='inference')
+        self.queues = {}
+        self.rejected = 0
+        self.completed = 0
+        self._tasks = []
+        tracing.register_collector(self._metrics)
+
+    # Operations, run in the thread pool
+
+    @staticmethod
+    def _analyze(payload):
+        if 'texts' in payload:
+            return nlp_utils.analyze_grammar_batch(payload['texts'], payload['language'])
+        if payload.get('incremental'):
+            return nlp_utils.analyze_grammar_incremental(payload['text'], payload['language'])
+        return nlp_utils.analyze_grammar(payload['text'], payload['language'])
+
+    @staticmethod
+    def _correct(payload):
+        if payload.get('incremental'):
+            return nlp_utils.correct_text_incremental(payload['text'], payload['language'])
+        return nlp_utils.correct_text(payload['text'], payload['language'])
+
+    @staticmethod
+    def _split(payload):
+        return nlp_utils.split_sentences(payload['text'], payload['language'])
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self.queues = {name: asyncio.Queue(maxsize=self.max_queue)
+                       for name in ('translate', 'analyze', 'correct', 'split')}
+        # Batches in flight are capped so that, under load, requests wait in the bounded queue
+        self._translation_slots = asyncio.Semaphore(self.workers)
+        self._tasks.append(loop.create_task(self._translate_worker()))
+        for name, fn in (('analyze', self._analyze), ('correct', self._correct), ('split', self._split)):
+            for _ in range(self.workers):
+                self._tasks.append(loop.create_task(self._simple_worker(name, fn)))
+
+    async def _simple_worker(self, name, fn):
+        loop = asyncio.get_running_loop()
+        queue = self.queues[name]
+        while True:
+            job = await queue.get()
+            if job.future.cancelled():
+                continue
+            try:
+                result = await loop.run_in_executor(self.executor, fn, job.payload)
+                if not job.future.cancelled():
+                    job.future.set_result(result)
+            except Exception as e:
+                if not job.future.cancelled():
+                    job.future.set_exception(e)
+
+    async def _translate_worker(self):
+        # Collect requests for a few milliseconds, then translate each language pair in one batch
+        loop = asyncio.get_running_loop()
+        queue = self.queues['translate']
+        while True:
+            jobs = [await queue.get()]
+            size = self._batch_size(jobs[0])
+            deadline = loop.time() + self.batch_window
+            while size < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    jobs.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+                size += self._batch_size(jobs[-1])
+
+            groups = {}
+            for job in jobs:
+                if job.future.done():
+                    continue
+                try:
+                    key = (job.payload['source_lang'], job.payload['target_lang'])
+                    texts = job.payload['texts']
+                except (KeyError, TypeError) as e:
+                    # route() validates payloads; a bad one still only fails its own request
+                    job.future.set_exception(ValueError(f'bad translation request: {e!r}'))
+                    continue
+                groups.setdefault(key, []).append((job, texts))
+            for (source, target), group in groups.items():
+                texts = [text for _, job_texts in group for text in job_texts]
+                await self._translation_slots.acquire()
+                loop.create_task(self._run_translation([job for job, _ in group], texts, source, target))
+
+    @staticmethod
+    def _batch_size(job):
+        try:
+            return len(job.payload['texts'])
+        except (KeyError, TypeError):
+            return 1
+
+    async def _run_translation(self, jobs, texts, source, target):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self.executor, nlp_utils.translate_batch, texts, source, target)
+        except Exception as e:
+            for job in jobs:
+                if not job.future.cancelled():
+                    job.future.set_exception(e)
+            return
+        finally:
+            self._translation_slots.release()
+        start = 0
+        for job in jobs:
+            count = len(job.payload['texts'])
+            if not job.future.cancelled():
+                job.future.set_result(results[start:start + count])
+            start += count
+
+    async def submit(self, name, payload):
+        job = Job(payload, asyncio.get_running_loop().create_future())
+        try:
+            self.queues[name].put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise
+        result = await job.future
+        self.completed += 1
+        return result
+
+    def _metrics(self):
+        values = {'inference_rejected_total': self.rejected, 'inference_completed_total': self.completed}
+        for name, queue in self.queues.items():
+            values[f'inference_queue_depth_{name}'] = queue.qsize()
+        return values
+
+    # HTTP
+
+    async def route(self, method, path, body):
+        if method == 'GET' and path == '/health':
+            return 200, {'status': 'ok', 'queues': {name: q.qsize() for name, q in self.queues.items()}}
+        if method == 'GET' and path == '/status':
+            return 200, {'resources': nlp_utils.startup_report()}
+        if method == 'GET' and path == '/languages':
+            return 200, {'languages': nlp_utils.supported_languages()}
+        if method == 'GET' and path == '/metrics':
+            return 200, tracing.render_prometheus()
+        if method != 'POST':
+            return 404, {'error': 'not found'}
+
+        payload = json.loads(body or b'{}')
+        if not isinstance(payload, dict):
+            raise ValueError('expected a JSON object')
+        if path == '/translate':
+            single = 'text' in payload
+            if not single and not isinstance(payload.get('texts', []), list):
+                raise ValueError("'texts' must be a list of strings")
+            payload['texts'] = [payload['text']] if single else list(payload.get('texts', []))
+            _require(payload, 'source_lang', 'target_lang')
+            if not all(isinstance(text, str) for text in payload['texts']):
+                raise ValueError("'texts' must be a list of strings")
+            results = await self.submit('translate', payload)
+            return 200, {'translation': results[0]} if single else {'translations': results}
+        if path == '/tokens':
+            # Token records (word, POS, dependency) for many texts, as nlp_utils.analyze_grammar_batch
+            _require(payload, 'language')
+            if not isinstance(payload.get('texts'), list) or not all(isinstance(t, str) for t in payload['texts']):
+                raise ValueError("'texts' must be a list of strings")
+            payload = {'texts': payload['texts'], 'language': payload['language']}
+            return 200, {'tokens': await self.submit('analyze', payload)}
+        if path not in ('/analyze', '/correct', '/split'):
+            return 404, {'error': 'not found'}
+        _require(payload, 'text', 'language')
+        payload.pop('texts', None)
+        if path == '/analyze':
+            return 200, {'analysis': await self.submit('analyze', payload)}
+        if path == '/correct':
+            corrected, corrections = await self.submit('correct', payload)
+            return 200, {'corrected': corrected, 'corrections': corrections}
+        return 200, {'sentences': await self.submit('split', payload)}
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, path, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length', 0))
+            if length > MAX_BODY_BYTES:
+                status, response = 413, {'error': 'request too large'}
+            else:
+                body = await reader.readexactly(length) if length else b''
+                try:
+                    status, response = await self.route(method, path.split('?')[0], body)
+                except asyncio.QueueFull:
+                    status, response = 503, {'error': 'server busy, try again'}
+                except (ValueError, KeyError) as e:
+                    status, response = 400, {'error': f'bad request: {e}'}
+                except Exception as e:
+                    status, response = 500, {'error': str(e)}
+            await self._respond(writer, status, response)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, response):
+        if isinstance(response, str):
+            data, content_type = response.encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            data, content_type = json.dumps(response, ensure_ascii=False).encode('utf-8'), 'application/json'
+        reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+                  500: 'Internal Server Error', 503: 'Service Unavailable'}[status]
+        head = [f'HTTP/1.1 {status} {reason}', f'Content-Type: {content_type}',
+                f'Content-Length: {len(data)}', 'Connection: close']
+        if status == 503:
+            head.append('Retry-After: 1')
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + data)
+        await writer.drain()
+
+
+def bind(args):
+    if args.unix_socket:
+        if os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(args.unix_socket)
+        sock.listen(1024)
+        return sock
+    return socket.create_server((args.host, args.port), backlog=1024)
+
+
+async def serve(args, sock):
+    server = InferenceServer(workers=args.workers, max_queue=args.max_queue,
+                             batch_window_ms=args.batch_window_ms, max_batch=args.max_batch)
+    server.start()
+    if args.warm_up:
+        await asyncio.get_running_loop().run_in_executor(None, nlp_utils.warm_up, args.warm_up)
+    if args.unix_socket:
+        listener = await asyncio.start_unix_server(server.handle, sock=sock)
+    else:
+        listener = await asyncio.start_server(server.handle, sock=sock)
+    async with listener:
+        await listener.serve_forever()
+
+
+def run_processes(args, sock):
+    # Pre-fork: whatever --preload loaded in this process is shared copy-on-write by the workers.
+    # gc.freeze() keeps the garbage collector from touching (and so copying) those pages.
+    # SQLite connections are not shared: the translation cache opens its own in each worker
+    gc.freeze()
+    children = []
+    for _ in range(args.processes):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                asyncio.run(serve(args, sock))
+            except KeyboardInterrupt:
+                pass
+            os._exit(0)
+        children.append(pid)
+
+    def stop(signum, frame):
+        for child in children:
+            try:
+                os.kill(child, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for child in children:
+            os.waitpid(child, 0)
+    except KeyboardInterrupt:
+        stop(signal.SIGINT, None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0], epilog=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--unix-socket', help='listen on a Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=4, help='threads running model calls')
+    parser.add_argument('--max-queue', type=int, default=256, help='queued requests per operation before 503')
+    parser.add_argument('--batch-window-ms', type=float, default=5.0)
+    parser.add_argument('--max-batch', type=int, default=32)
+    parser.add_argument('--warm-up', default='', help="resources to load at startup, e.g. 'all'")
+    parser.add_argument('--processes', type=int, default=1, help='worker processes sharing the listening socket')
+    parser.add_argument('--preload', default='',
+                        help="resources to load once before forking the worker processes, e.g. 'all'")
+    args = parser.parse_args(argv)
+
+    sock = bind(args)
+    if args.preload:
+        nlp_utils.warm_up(args.preload)
+    where = f"unix://{args.unix_socket}" if args.unix_socket else f"http://{args.host}:{args.port}"
+    print(f"Inference server listening on {where} ({args.processes} process(es))")
+    if args.processes > 1:
+        run_processes(args, sock)
+    else:
+        asyncio.run(serve(args, sock))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import threading
+import time
+
+# Every lazy resource created in this process, in creation order
+_resources = []
+_resources_lock = threading.Lock()
+
+
+class LazyResource:
+    """A heavy object (spaCy pipeline, LanguageTool server, ...) built on first use.
+
+    The loader runs at most once, even when several threads ask for the
+    resource at the same time. If it fails, the failure is remembered and
+    `get()` returns None, so callers can fall back to a degraded mode.
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._value = None
+        self.status = 'not loaded'
+        self.seconds = None
+        self.error = None
+        with _resources_lock:
+            _resources.append(self)
+
+    @property
+    def loaded(self):
+        return self.status in ('loaded', 'failed')
+
+    def get(self):
+        if self.loaded:
+            return self._value
+        with self._lock:
+            if not self.loaded:
+                start = time.perf_counter()
+                try:
+                    self._value = self._loader()
+                    self.status = 'loaded' if self._value is not None else 'failed'
+                except Exception as e:
+                    print(f"Warning: Could not load {self.name}: {e}")
+                    self._value = None
+                    self.error = str(e)
+                    self.status = 'failed'
+                self.seconds = time.perf_counter() - start
+        return self._value
+
+    def reset(self):
+        with self._lock:
+            self._value = None
+            self.status = 'not loaded'
+            self.seconds = None
+            self.error = None
+
+
+def load_report():
+    # What has been loaded so far and how long each load took
+    with _resources_lock:
+        resources = list(_resources)
+    return [{'resource': r.name, 'status': r.status, 'seconds': r.seconds, 'error': r.error}
+            for r in resources]
@@ -0,0 +1,135 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from tracing import register_collector
+
+# Only short texts are translated speculatively; long ones wait for the button
+MAX_CHARS = int(os.environ.get('LINGUALEARN_LIVE_MAX_CHARS', '300'))
+WORKERS = int(os.environ.get('LINGUALEARN_LIVE_WORKERS', '2'))
+
+
+class LiveTranslator:
+    """Translates a learner's text before they ask for it.
+
+    `submit` is called whenever Streamlit reports a committed edit (on_change
+    fires on Ctrl+Enter, on leaving the text box or on a language change, not
+    on every keystroke) and queues the translation at once. An edit made
+    before a queued request starts cancels it, and the same text asked for by
+    several sessions is translated once. `result` then returns the
+    translation, waiting if it is still running, or None when nothing was
+    submitted for that text. Failed translations are forgotten, so the next
+    submit tries again.
+    """
+
+    def __init__(self, translate_fn, is_error=lambda result: False, max_chars=MAX_CHARS, workers=WORKERS,
+                 max_results=256, max_sessions=1000):
+        self._translate = translate_fn
+        self._is_error = is_error
+        self.max_chars = max_chars
+        self.max_results = max_results
+        self.max_sessions = max_sessions
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='live-translation')
+        self._lock = threading.Lock()
+        self._futures = OrderedDict()  # (text, source, target) -> Future, oldest first
+        self._latest = OrderedDict()  # session -> key of its most recent edit
+        self.submitted = 0
+        self.deduplicated = 0
+        self.cancelled = 0
+        self.translated = 0
+        self.failed = 0
+
+    def submit(self, session_id, text, source_lang, target_lang):
+        if not text.strip() or len(text) > self.max_chars or source_lang == target_lang:
+            return None
+        key = (text, source_lang, target_lang)
+        with self._lock:
+            previous = self._latest.pop(session_id, None)
+            self._latest[session_id] = key
+            while len(self._latest) > self.max_sessions:
+                self._latest.popitem(last=False)
+            if previous is not None and previous != key:
+                self._drop_if_unwanted(previous)
+
+            future = self._futures.get(key)
+            if future is not None and not future.cancelled():
+                self._futures.move_to_end(key)
+                self.deduplicated += 1
+                return future
+            future = self._futures[key] = Future()
+            self._trim()
+            self.submitted += 1
+        self._executor.submit(self._run, key, future)
+        return future
+
+    def _drop_if_unwanted(self, key):
+        # Called with the lock held: cancel a request nobody is waiting for, if it has not started yet
+        if key in self._latest.values():
+            return
+        future = self._futures.get(key)
+        if future is not None and future.cancel():
+            del self._futures[key]
+            self.cancelled += 1
+
+    def _trim(self):
+        # Called with the lock held: forget the oldest finished translations
+        for key in list(self._futures):
+            if len(self._futures) <= self.max_results:
+                break
+            if self._futures[key].done():
+                del self._futures[key]
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+            self.failed += 1
+
+    def _run(self, key, future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = self._translate(*key)
+        except Exception as e:
+            self._forget(key, future)
+            future.set_exception(e)
+            return
+        if self._is_error(result):
+            self._forget(key, future)
+        else:
+            with self._lock:
+                self.translated += 1
+        future.set_result(result)
+
+    def result(self, text, source_lang, target_lang, timeout=None):
+        with self._lock:
+            future = self._futures.get((text, source_lang, target_lang))
+        if future is None or future.cancelled():
+            return None
+        try:
+            return future.result(timeout)
+        except Exception:
+            return None
+
+    def stats(self):
+        with self._lock:
+            return {'submitted': self.submitted, 'deduplicated': self.deduplicated, 'cancelled': self.cancelled,
+                    'translated': self.translated, 'failed': self.failed,
+                    'pending': sum(not f.done() for f in self._futures.values())}
+
+
+_translator = None
+_translator_lock = threading.Lock()
+
+
+def get_live_translator():
+    global _translator
+    if _translator is None:
+        with _translator_lock:
+            if _translator is None:
+                from inference_client import is_translation_error, translate_text
+                _translator = LiveTranslator(translate_text, is_translation_error)
+                register_collector(lambda: {f'live_translation_{name}': value
+                                            for name, value in _translator.stats().items()})
+    return _translator
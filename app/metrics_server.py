@@ -0,0 +1,44 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import tracing
+
+_server = None
+_server_lock = threading.Lock()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = tracing.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood the Streamlit log
+
+
+def start_metrics_server(port=None, host=None):
+    """Serves /metrics in Prometheus text format from a daemon thread (once per process).
+
+    Listens on localhost unless `host` or LINGUALEARN_METRICS_HOST (e.g. 0.0.0.0) says otherwise.
+    """
+    global _server
+    port = int(port or os.environ.get('LINGUALEARN_METRICS_PORT', '9108'))
+    host = host or os.environ.get('LINGUALEARN_METRICS_HOST', '127.0.0.1')
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), MetricsHandler)
+            except OSError as e:
+                print(f"Warning: Could not start metrics server on {host}:{port}: {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, name='metrics-server', daemon=True).start()
+    return _server
+
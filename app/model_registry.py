@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Memory budget for loaded translation models (in MB), shared by the whole process
+DEFAULT_MEMORY_BUDGET_MB = int(os.environ.get('LINGUALEARN_MODEL_MEMORY_MB', '2048'))
+
+
+def estimate_model_bytes(model):
+    # Size of parameters and buffers; good enough to compare models against the budget
+    try:
+        total = sum(p.numel() * p.element_size() for p in model.parameters())
+        total += sum(b.numel() * b.element_size() for b in model.buffers())
+        return total
+    except Exception:
+        return 0
+
+
+class ModelRegistry:
+    """Process-wide cache of loaded models, keyed by language pair (e.g. 'English-French').
+
+    Each pair is loaded once and shared across Streamlit sessions and threads.
+    When the total size goes over the memory budget, the least recently used
+    pairs are evicted. Values are translation backends; their size comes from
+    `size_bytes()` unless another `size_fn` is given.
+    """
+
+    def __init__(self, loader, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, size_fn=None):
+        self._loader = loader
+        self._size_fn = size_fn or (lambda backend: backend.size_bytes())
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self._entries = OrderedDict()  # key -> (value, size_in_bytes)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_times = {}
+
+    def get(self, key, *loader_args):
+        # loader_args are passed to the loader the first time `key` is requested
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Only one thread loads a given pair; the others wait and reuse its result
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][0]
+                self.misses += 1
+
+            start = time.perf_counter()
+            value = self._loader(*loader_args)
+            elapsed = time.perf_counter() - start
+            size = self._size_fn(value)
+
+            with self._lock:
+                self.load_times.setdefault(key, []).append(elapsed)
+                self._entries[key] = (value, size)
+                self._entries.move_to_end(key)
+                self._evict()
+            return value
+
+    def _evict(self):
+        # Always keep the most recently used entry, even if it alone exceeds the budget
+        while len(self._entries) > 1 and self.memory_used() > self.memory_budget:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def memory_used(self):
+        return sum(size for _, size in self._entries.values())
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def loaded(self):
+        with self._lock:
+            return list(self._entries.keys())
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'loaded': list(self._entries.keys()),
+                'memory_used_mb': self.memory_used() / (1024 * 1024),
+                'memory_budget_mb': self.memory_budget / (1024 * 1024),
+                'load_seconds': {k: sum(v) for k, v in self.load_times.items()},
+            }
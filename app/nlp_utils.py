@@ -1,7 +1,17 @@
-from transformers import MarianMTModel, MarianTokenizer
-import spacy
-import language_tool_python
+import os
 import sys
+from model_registry import ModelRegistry
+from batcher import MicroBatcher
+from translation_cache import TranslationCache
+from lazy_resources import LazyResource, load_report
+from correction_service import CorrectionService
+from incremental import SentenceCache, process_incrementally, sentence_spans, shift_match
+from translation_backends import BACKENDS, DEFAULT_BACKEND, create_backend
+from translation_router import TranslationRouter
+from tracing import register_collector, span, traced
+
+# Heavy libraries (transformers, torch, spaCy, LanguageTool) are imported and
+# loaded on first use, so importing this module stays fast
 
 # Translation models
 model_names = {
@@ -20,89 +30,368 @@ spacy_models = {
     'Arabic': 'xx_ent_wiki_sm'  # Using multilingual model with some Arabic support
 }
 
-# Load spaCy models with error handling
-nlp_models = {}
-for lang, model in spacy_models.items():
-    try:
-        nlp_models[lang] = spacy.load(model)
-    except IOError:
-        print(f"Warning: Could not load spaCy model for {lang}. Some features will be limited.")
+# LanguageTool language codes (Arabic has limited LanguageTool support)
+languagetool_codes = {'English': 'en-US', 'French': 'fr'}
+
+# Components nothing in the app reads (analysis only uses POS tags, dependencies
+# and sentence boundaries), so they are never loaded
+SPACY_EXCLUDE = ["ner", "lemmatizer", "textcat", "entity_linker", "entity_ruler"]
+
+def _spacy_loader(lang, model):
+    def load():
+        import spacy
         try:
-            # Try loading a small multilingual model as fallback
-            if lang == 'Arabic':
-                # Install the model if you haven't yet: python -m spacy download xx_ent_wiki_sm
-                nlp_models[lang] = spacy.load("xx_ent_wiki_sm")
-            else:
-                nlp_models[lang] = None
-        except:
-            nlp_models[lang] = None
-
-# Initialize LanguageTool with error handling
-tools = {}
-try:
-    # Try to initialize LanguageTool for each language
-    for lang, code in {'English': 'en-US', 'French': 'fr'}.items():
+            return spacy.load(model, exclude=SPACY_EXCLUDE)
+        except IOError:
+            # Install the model if you haven't yet: python -m spacy download <model>
+            print(f"Warning: Could not load spaCy model for {lang}. Some features will be limited.")
+            return None
+    return load
+
+nlp_models = {lang: LazyResource(f"spaCy {model}", _spacy_loader(lang, model))
+              for lang, model in spacy_models.items()}
+
+# Pool of LanguageTool instances shared by every session
+correction_service = CorrectionService(languagetool_codes)
+
+def get_nlp(language):
+    resource = nlp_models.get(language)
+    return resource.get() if resource is not None else None
+
+# Inference engine per language pair (pytorch, quantized, onnx or ctranslate2);
+# pairs not listed use LINGUALEARN_TRANSLATION_BACKEND (default: pytorch)
+# e.g. LINGUALEARN_BACKENDS="English-French=ctranslate2,French-English=quantized"
+def parse_backends(value):
+    # Fails at startup on a typo, rather than silently using the default backend for that pair
+    backends = {}
+    for part in filter(None, (part.strip() for part in value.split(","))):
+        pair, _, backend = (item.strip() for item in part.partition("="))
+        if pair not in model_names:
+            raise ValueError(f"Unknown language pair in LINGUALEARN_BACKENDS: {pair!r} "
+                             f"(choose from {', '.join(model_names)})")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown translation backend in LINGUALEARN_BACKENDS: {backend!r} for {pair} "
+                             f"(choose from {', '.join(BACKENDS)})")
+        backends[pair] = backend
+    return backends
+
+model_backends = parse_backends(os.environ.get('LINGUALEARN_BACKENDS', ''))
+
+def get_backend_name(model_key):
+    return model_backends.get(model_key, DEFAULT_BACKEND)
+
+def get_model_id(model_key):
+    # Identifies the exact model producing a pair's translations (used as cache key)
+    backend = get_backend_name(model_key)
+    model_name = model_names[model_key]
+    return model_name if backend == 'pytorch' else f"{model_name}@{backend}"
+
+def load_translation_model(model_name, backend=DEFAULT_BACKEND):
+    with span("model.load", model=model_name, backend=backend):
+        return create_backend(model_name, backend)
+
+# Shared by every session and thread in this process
+model_registry = ModelRegistry(load_translation_model)
+
+def warm_up(resources="all"):
+    # Optional pre-loading, e.g. warm_up("spacy,languagetool") or warm_up("English-French")
+    names = [name.strip() for name in resources.split(",") if name.strip()]
+    everything = "all" in names
+    if everything or "spacy" in names:
+        for language in nlp_models:
+            get_nlp(language)
+    if everything or "languagetool" in names:
+        correction_service.warm_up()
+    for model_key, model_name in model_names.items():
+        if everything or "marian" in names or model_key in names:
+            try:
+                model_registry.get(model_key, model_name, get_backend_name(model_key))
+            except Exception as e:
+                print(f"Warning: Could not load translation model {model_name}: {e}")
+
+def startup_report():
+    report = load_report()
+    for model_key, seconds in model_registry.stats()['load_seconds'].items():
+        report.append({'resource': f"MarianMT {get_model_id(model_key)}", 'status': 'loaded',
+                       'seconds': seconds, 'error': None})
+    return report
+
+if os.environ.get('LINGUALEARN_WARMUP'):
+    warm_up(os.environ['LINGUALEARN_WARMUP'])
+
+# Larger batches keep the CPU busy but pad short sentences to the longest one
+TRANSLATION_BATCH_SIZE = 16
+
+def _run_model(model_key, texts):
+    backend = model_registry.get(model_key, model_names[model_key], get_backend_name(model_key))
+    results = [None] * len(texts)
+    # Sort by length so sentences in the same batch need little padding
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    for start in range(0, len(order), TRANSLATION_BATCH_SIZE):
+        chunk = order[start:start + TRANSLATION_BATCH_SIZE]
+        with span("translate.model", pair=model_key, batch=len(chunk)):
+            outputs = backend.translate([texts[i] for i in chunk])
+        for i, output in zip(chunk, outputs):
+            results[i] = output
+    return results
+
+# Repeated phrases are served from memory or disk instead of running the model again
+translation_cache = TranslationCache()
+translation_cache.sync_models({model_key: get_model_id(model_key) for model_key in model_names})
+
+def _translate_uncached(model_key, texts):
+    # Runs the model on texts already looked up in the cache (and missed), then stores the results
+    unique = list(dict.fromkeys(texts))
+    translated = _run_model(model_key, unique)
+    translation_cache.put_many(model_key, get_model_id(model_key), unique, translated)
+    by_text = dict(zip(unique, translated))
+    return [by_text[text] for text in texts]
+
+def _generate_batch(model_key, texts):
+    results = translation_cache.get_many(model_key, get_model_id(model_key), texts)
+    missing = [i for i in range(len(texts)) if i not in results]
+    if missing:
+        for i, translation in zip(missing, _translate_uncached(model_key, [texts[i] for i in missing])):
+            results[i] = translation
+    return [results[i] for i in range(len(texts))]
+
+def _translation_error(e):
+    if isinstance(e, ImportError):
+        if "sentencepiece" in str(e).lower():
+            return "ERROR: Missing SentencePiece library. Please run: pip install sentencepiece"
+        return f"ERROR: {str(e)}"
+    return f"Translation error: {str(e)}"
+
+# Concurrent translate_text calls for the same pair are grouped into one generate call.
+# translate_text has already looked each text up in the cache, so the batch does not look again
+translation_batcher = MicroBatcher(_translate_uncached)
+
+# Pairs without a direct model are chained through other models (usually via English)
+translation_router = TranslationRouter(model_names)
+
+UNSUPPORTED_PAIR = "Translation not supported for this language pair"
+
+def supported_languages():
+    return translation_router.languages()
+
+def _translate_route(texts, route):
+    # Each hop goes through the cache, so the pivot text is reused by other targets
+    for model_key in route:
+        texts = _generate_batch(model_key, texts)
+    return texts
+
+@traced("translate_batch")
+def translate_batch(texts, source_lang, target_lang):
+    texts = list(texts)
+    route = translation_router.route(source_lang, target_lang)
+    if route is None:
+        return [UNSUPPORTED_PAIR] * len(texts)
+    
+    try:
+        return _translate_route(texts, route)
+    except Exception as e:
+        return [_translation_error(e)] * len(texts)
+
+@traced("translate_to_many")
+def translate_to_many(texts, source_lang, target_langs):
+    # {target_lang: translations}; routes sharing a first hop (e.g. source -> English) run it once
+    texts = list(texts)
+    groups, unreachable = translation_router.plan(source_lang, target_langs)
+    results = {target: [UNSUPPORTED_PAIR] * len(texts) for target in unreachable}
+    for first_hop, targets in groups.items():
         try:
-            tools[lang] = language_tool_python.LanguageTool(code)
+            pivot = _translate_route(texts, [first_hop] if first_hop else [])
         except Exception as e:
-            print(f"Warning: Could not initialize LanguageTool for {lang}: {e}")
-            tools[lang] = None
-    
-    # Arabic has limited LanguageTool support
-    tools['Arabic'] = None
-except Exception as e:
-    print(f"Warning: LanguageTool initialization failed. Text correction will be disabled.\nError: {e}")
-    print("To fix this issue, install Java 17 or higher (current version is too old).")
-    # Set all tools to None if global initialization fails
-    tools = {lang: None for lang in ['English', 'French', 'Arabic']}
+            for target, _ in targets:
+                results[target] = [_translation_error(e)] * len(texts)
+            continue
+        for target, remaining in targets:
+            try:
+                results[target] = _translate_route(pivot, remaining)
+            except Exception as e:
+                results[target] = [_translation_error(e)] * len(texts)
+    return results
 
+@traced("translate_text")
 def translate_text(text, source_lang, target_lang):
-    if source_lang == target_lang:
+    route = translation_router.route(source_lang, target_lang)
+    if route is None:
+        return UNSUPPORTED_PAIR
+    
+    try:
+        for model_key in route:
+            cached = translation_cache.get(model_key, get_model_id(model_key), text)
+            text = cached if cached is not None else translation_batcher.submit(model_key, text).result()
         return text
+    except Exception as e:
+        return _translation_error(e)
+
+def is_translation_error(text):
+    # translate_text and translate_batch return these messages instead of raising
+    return text == UNSUPPORTED_PAIR or text.startswith(("ERROR: ", "Translation error: "))
+
+def _split_plain(text):
+    # Without a spaCy sentence splitter: the same boundaries the incremental checkers use
+    return [text[start:end] for start, end in sentence_spans(text)]
+
+def split_sentences(text, language):
+    nlp = get_nlp(language)
+    if nlp is None or not (nlp.has_pipe("parser") or nlp.has_pipe("senter") or nlp.has_pipe("sentencizer")):
+        return _split_plain(text)
+    # One paragraph at a time keeps each doc under nlp.max_length, however long the document
+    paragraphs = [paragraph for paragraph in text.splitlines() if paragraph.strip()]
+    sentences = []
+    for paragraph in paragraphs:
+        if len(paragraph) > nlp.max_length:
+            sentences.extend(_split_plain(paragraph))
+            continue
+        try:
+            sentences.extend(sent.text.strip() for sent in nlp(paragraph).sents if sent.text.strip())
+        except ValueError:
+            sentences.extend(_split_plain(paragraph))
+    return sentences
+
+def translate_document(text, source_lang, target_lang, batch_size=TRANSLATION_BATCH_SIZE):
+    # Yields translated sentences in order, one batch at a time, so long inputs
+    # are never truncated and the first sentences can be shown right away
+    sentences = split_sentences(text, source_lang)
+    for start in range(0, len(sentences), batch_size):
+        for translated in translate_batch(sentences[start:start + batch_size], source_lang, target_lang):
+            yield translated
+
+def _token_records(doc, text_id=0):
+    return [{'text_id': text_id, 'token_id': token.i, 'word': token.text, 'pos': token.pos_, 'dep': token.dep_}
+            for token in doc]
+
+@traced("analyze_grammar_batch")
+def analyze_grammar_batch(texts, language, batch_size=256, n_process=1, as_dataframe=False):
+    # Bulk analysis: one record per token, tagged with the index of its text
+    nlp = get_nlp(language)
+    if nlp is None:
+        raise ValueError(f"Grammar analysis not available for {language}")
     
-    model_key = f"{source_lang}-{target_lang}"
-    if model_key not in model_names:
-        return "Translation not supported for this language pair"
+    records = []
+    for text_id, doc in enumerate(nlp.pipe(texts, batch_size=batch_size, n_process=n_process)):
+        records.extend(_token_records(doc, text_id))
+    if as_dataframe:
+        import pandas as pd
+        return pd.DataFrame.from_records(records, columns=['text_id', 'token_id', 'word', 'pos', 'dep'])
+    return records
+
+def format_grammar_analysis(records):
+    return "\n".join(f"Word: {r['word']}, POS: {r['pos']}, Dependency: {r['dep']}" for r in records)
+
+ANALYSIS_UNAVAILABLE = "Grammar analysis not available for this language"
+
+@traced("analyze_grammar")
+def analyze_grammar(text, language):
+    nlp = get_nlp(language)
+    if nlp is None:
+        return ANALYSIS_UNAVAILABLE
     
     try:
-        model_name = model_names[model_key]
-        tokenizer = MarianTokenizer.from_pretrained(model_name)
-        model = MarianMTModel.from_pretrained(model_name)
-        
-        inputs = tokenizer(text, return_tensors="pt", padding=True)
-        translated = model.generate(**inputs)
-        return tokenizer.decode(translated[0], skip_special_tokens=True)
-    except ImportError as e:
-        if "sentencepiece" in str(e).lower():
-            return "ERROR: Missing SentencePiece library. Please run: pip install sentencepiece"
-        else:
-            return f"ERROR: {str(e)}"
+        with span("spacy.parse", language=language):
+            doc = nlp(text)
+        return format_grammar_analysis(_token_records(doc))
     except Exception as e:
-        return f"Translation error: {str(e)}"
+        return f"Error during grammar analysis: {str(e)}"
 
-def analyze_grammar(text, language):
-    if language not in nlp_models or nlp_models[language] is None:
-        return "Grammar analysis not available for this language"
+CORRECTION_UNAVAILABLE = "Text correction not available. LanguageTool requires Java 17+ (you have an older version)."
+
+def _apply_corrections(text, matches):
+    import language_tool_python
+    corrected = language_tool_python.utils.correct(text, matches)
+    corrections = [f"Original: {m.context} -> Suggested: {m.replacements[0] if m.replacements else 'N/A'}" 
+                  for m in matches]
+    return corrected, corrections
+
+@traced("correct_text")
+def correct_text(text, language):
+    if not correction_service.available(language):
+        return text, [CORRECTION_UNAVAILABLE]
     
-    nlp = nlp_models[language]
-    doc = nlp(text)
+    try:
+        matches = correction_service.check(text, language)
+        return _apply_corrections(text, matches)
+    except Exception as e:
+        return text, [f"Error during text correction: {str(e)}"]
+
+@traced("correct_text_batch")
+def correct_text_batch(texts, language):
+    # Checks the texts concurrently across the LanguageTool pool
+    texts = list(texts)
+    if not correction_service.available(language):
+        return [(text, [CORRECTION_UNAVAILABLE]) for text in texts]
     
-    analysis = []
-    for token in doc:
-        analysis.append(f"Word: {token.text}, POS: {token.pos_}, Dependency: {token.dep_}")
-    return "\n".join(analysis)
+    try:
+        all_matches = correction_service.check_many(texts, language)
+        return [_apply_corrections(text, matches) for text, matches in zip(texts, all_matches)]
+    except Exception as e:
+        return [(text, [f"Error during text correction: {str(e)}"]) for text in texts]
 
-def correct_text(text, language):
-    if language not in tools or tools[language] is None:
-        return text, ["Text correction not available. LanguageTool requires Java 17+ (you have an older version)."]
+# Per-sentence results, so an edit only re-checks the sentences it touched
+match_cache = SentenceCache()
+analysis_cache = SentenceCache()
+
+@traced("correct_text_incremental")
+def correct_text_incremental(text, language):
+    if not correction_service.available(language):
+        return text, [CORRECTION_UNAVAILABLE]
     
     try:
-        tool = tools[language]
-        matches = tool.check(text)
-        corrected = language_tool_python.utils.correct(text, matches)
-        
-        corrections = [f"Original: {m.context} -> Suggested: {m.replacements[0] if m.replacements else 'N/A'}" 
-                      for m in matches]
-        return corrected, corrections
+        sentences = process_incrementally(text, language, match_cache,
+                                          lambda changed: correction_service.check_many(changed, language))
+        matches = [shift_match(m, start) for (start, _), sentence_matches in sentences for m in sentence_matches]
+        return _apply_corrections(text, matches)
     except Exception as e:
-        return text, [f"Error during text correction: {str(e)}"]
\ No newline at end of file
+        return text, [f"Error during text correction: {str(e)}"]
+
+@traced("analyze_grammar_incremental")
+def analyze_grammar_incremental(text, language):
+    nlp = get_nlp(language)
+    if nlp is None:
+        return ANALYSIS_UNAVAILABLE
+    
+    try:
+        sentences = process_incrementally(text, language, analysis_cache,
+                                          lambda changed: [_token_records(doc) for doc in nlp.pipe(changed)])
+        return format_grammar_analysis(record for _, records in sentences for record in records)
+    except Exception as e:
+        return f"Error during grammar analysis: {str(e)}"
+
+def is_analysis_error(analysis):
+    # analyze_grammar and analyze_grammar_incremental return these messages instead of raising
+    return analysis == ANALYSIS_UNAVAILABLE or analysis.startswith("Error during grammar analysis: ")
+
+def is_correction_error(result):
+    # (text, corrections) from the correct_text functions, when the check itself did not run
+    return any(c == CORRECTION_UNAVAILABLE or c.startswith("Error during text correction: ") for c in result[1])
+
+def _collect_metrics():
+    # Counters exported by tracing.render_prometheus() and the metrics endpoint
+    models = model_registry.stats()
+    cache = translation_cache.stats()
+    batcher = translation_batcher.stats()
+    values = {
+        'model_cache_hits_total': models['hits'],
+        'model_cache_misses_total': models['misses'],
+        'model_loads_total': models['misses'],
+        'model_evictions_total': models['evictions'],
+        'model_memory_mb': models['memory_used_mb'],
+        'translation_cache_memory_hits_total': cache['memory_hits'],
+        'translation_cache_disk_hits_total': cache['disk_hits'],
+        'translation_cache_misses_total': cache['misses'],
+        'translation_batches_total': batcher['batches'],
+        'translation_batched_items_total': batcher['items'],
+        'translation_batch_retries_total': batcher['retried'],
+        'translation_queue_depth': batcher['queued'],
+        'sentence_match_cache_hits_total': match_cache.hits,
+        'sentence_analysis_cache_hits_total': analysis_cache.hits,
+        'resources_loaded': sum(1 for row in load_report() if row['status'] == 'loaded'),
+    }
+    for language, instances in correction_service.stats().items():
+        values[f'languagetool_queue_depth_{language}'] = sum(i['queue_depth'] for i in instances)
+        values[f'languagetool_checks_total_{language}'] = sum(i['checks'] for i in instances)
+    return values
+
+register_collector(_collect_metrics)
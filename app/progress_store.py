@@ -0,0 +1,257 @@
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from tracing import register_collector, span
+
+DB_PATH = os.environ.get('LINGUALEARN_DB',
+                         os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lingualearn.db'))
+# Read connections shared by every thread; Streamlit runs each rerun on a new thread
+DB_READERS = int(os.environ.get('LINGUALEARN_DB_READERS', '4'))
+
+# Applied to every connection: WAL lets readers and the writer work at the same time
+PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-8000',
+    'PRAGMA foreign_keys=ON',
+]
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS users
+       (user_id TEXT PRIMARY KEY, level TEXT, progress INTEGER, last_quiz_score INTEGER,
+        updated_at REAL)''',
+    '''CREATE TABLE IF NOT EXISTS quiz_attempts
+       (attempt_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, level TEXT, score REAL,
+        created_at REAL)''',
+    'CREATE INDEX IF NOT EXISTS idx_quiz_attempts_user ON quiz_attempts(user_id, created_at)',
+    # Spaced-repetition state, one row per user and card (see srs.py)
+    '''CREATE TABLE IF NOT EXISTS review_state
+       (user_id TEXT NOT NULL, pair TEXT NOT NULL, item_id TEXT NOT NULL, ease REAL, interval REAL,
+        repetitions INTEGER, lapses INTEGER, due_at REAL, last_reviewed REAL,
+        PRIMARY KEY (user_id, pair, item_id))''',
+    'CREATE INDEX IF NOT EXISTS idx_review_state_due ON review_state(user_id, pair, due_at)',
+    # Every quiz answer, plus per-user and per-item totals kept up to date by a trigger (see analytics.py)
+    '''CREATE TABLE IF NOT EXISTS answer_events
+       (attempt_id TEXT NOT NULL, position INTEGER NOT NULL, user_id TEXT NOT NULL, pair TEXT NOT NULL,
+        item_id TEXT, item_level TEXT NOT NULL, question_type TEXT, correct INTEGER NOT NULL,
+        answered_at REAL NOT NULL, PRIMARY KEY (attempt_id, position))''',
+    '''CREATE TABLE IF NOT EXISTS user_stats
+       (user_id TEXT NOT NULL, pair TEXT NOT NULL, item_level TEXT NOT NULL, answers INTEGER NOT NULL,
+        correct INTEGER NOT NULL, first_answered_at REAL, last_answered_at REAL,
+        PRIMARY KEY (user_id, pair, item_level))''',
+    '''CREATE TABLE IF NOT EXISTS item_stats
+       (pair TEXT NOT NULL, item_id TEXT NOT NULL, item_level TEXT, question_type TEXT,
+        answers INTEGER NOT NULL, correct INTEGER NOT NULL, PRIMARY KEY (pair, item_id))''',
+    # Rows skipped by INSERT OR IGNORE (an answer saved twice) do not fire the trigger
+    '''CREATE TRIGGER IF NOT EXISTS answer_events_totals AFTER INSERT ON answer_events
+       BEGIN
+           INSERT INTO user_stats VALUES (NEW.user_id, NEW.pair, NEW.item_level, 1, NEW.correct,
+                                          NEW.answered_at, NEW.answered_at)
+           ON CONFLICT(user_id, pair, item_level) DO UPDATE SET
+               answers = answers + 1, correct = correct + excluded.correct,
+               last_answered_at = MAX(last_answered_at, excluded.last_answered_at);
+           INSERT INTO item_stats SELECT NEW.pair, NEW.item_id, NEW.item_level, NEW.question_type, 1, NEW.correct
+           WHERE NEW.item_id IS NOT NULL
+           ON CONFLICT(pair, item_id) DO UPDATE SET answers = answers + 1, correct = correct + excluded.correct;
+       END''',
+]
+
+
+class ProgressStore:
+    """User progress and quiz history in SQLite.
+
+    Reads borrow one of at most `readers` pooled connections (see `reader()`).
+    Writes are queued and committed in batches by one background writer
+    thread with its own connection, so request threads never wait on the
+    database file lock; call `flush()` to wait for them.
+    """
+
+    def __init__(self, path=DB_PATH, batch_size=200, readers=DB_READERS):
+        self.path = path
+        self.batch_size = batch_size
+        self._idle_readers = queue.LifoQueue()
+        self._reader_slots = threading.BoundedSemaphore(max(1, readers))
+        self._write_conn = None
+        self._queue = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self.writes = 0
+        self.commits = 0
+        self.failed = 0
+        self._init_schema()
+
+    def _connect(self):
+        # Used by one thread at a time, but not always the thread that opened it
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def reader(self):
+        """Borrows a read connection for the duration of the `with` block."""
+        with self._reader_slots:
+            try:
+                conn = self._idle_readers.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle_readers.put(conn)
+
+    def _init_schema(self):
+        with self.reader() as conn:
+            columns = conn.execute("PRAGMA table_info(users)").fetchall()
+            has_key = any(column[5] for column in columns)  # column[5] is the primary-key flag
+            if columns and not has_key:
+                self._migrate_legacy_users(conn)
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+
+    @staticmethod
+    def _migrate_legacy_users(conn):
+        # The old table had no key, so every save appended a row; keep the latest row per user
+        conn.execute('ALTER TABLE users RENAME TO users_legacy')
+        conn.execute(SCHEMA[0])
+        conn.execute('''INSERT INTO users (user_id, level, progress, last_quiz_score, updated_at)
+                        SELECT user_id, level, progress, last_quiz_score, NULL FROM users_legacy
+                        WHERE rowid IN (SELECT MAX(rowid) FROM users_legacy GROUP BY user_id)''')
+        conn.execute('DROP TABLE users_legacy')
+
+    # Writes
+
+    def save_progress(self, user_id, level, progress, quiz_score, attempt_id=None):
+        # attempt_id makes the history write idempotent: saving the same quiz twice keeps one row
+        self._enqueue(('progress', (user_id, level, progress, quiz_score, attempt_id, time.time())))
+
+    def _enqueue(self, item):
+        if self._writer is None or not self._writer.is_alive():
+            with self._writer_lock:
+                if self._writer is None or not self._writer.is_alive():
+                    self._writer = threading.Thread(target=self._write_loop, name='progress-writer', daemon=True)
+                    self._writer.start()
+        self._queue.put(item)
+
+    def flush(self, timeout=None):
+        done = threading.Event()
+        self._enqueue(('flush', done))
+        return done.wait(timeout)
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        waiters = [payload for kind, payload in batch if kind == 'flush']
+        writes = [(kind, payload) for kind, payload in batch if kind != 'flush']
+        try:
+            if writes:
+                self._commit_writes(writes)
+        finally:
+            for done in waiters:
+                done.set()
+
+    def _commit_writes(self, writes):
+        if self._write_conn is None:
+            self._write_conn = self._connect()
+        conn = self._write_conn
+        try:
+            self._apply(conn, writes)
+            return
+        except sqlite3.Error as e:
+            print(f"Warning: Could not save {len(writes)} writes together, retrying one at a time: {e}")
+        # The batch was rolled back; commit each write (each row of a 'many') on its own so only bad ones are lost
+        for kind, payload in writes:
+            items = [('sql', (payload[0], row)) for row in payload[1]] if kind == 'many' else [(kind, payload)]
+            for item in items:
+                try:
+                    self._apply(conn, [item])
+                except sqlite3.Error as e:
+                    self.failed += 1
+                    print(f"Warning: Could not save progress: {e}")
+
+    def _apply(self, conn, writes):
+        with span("db.write_batch", size=len(writes)), conn:
+            for kind, payload in writes:
+                if kind == 'progress':
+                    self._write_progress(conn, *payload)
+                elif kind == 'sql':
+                    conn.execute(*payload)
+                elif kind == 'many':
+                    conn.executemany(*payload)
+        self.writes += len(writes)
+        self.commits += 1
+
+    @staticmethod
+    def _write_progress(conn, user_id, level, progress, quiz_score, attempt_id, now):
+        conn.execute('''INSERT INTO users (user_id, level, progress, last_quiz_score, updated_at)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT(user_id) DO UPDATE SET
+                            level = excluded.level, progress = excluded.progress,
+                            last_quiz_score = excluded.last_quiz_score, updated_at = excluded.updated_at''',
+                     (user_id, level, progress, quiz_score, now))
+        if attempt_id is not None:
+            conn.execute('INSERT OR IGNORE INTO quiz_attempts VALUES (?, ?, ?, ?, ?)',
+                         (attempt_id, user_id, level, quiz_score, now))
+
+    def execute_deferred(self, sql, params=()):
+        # Any other write that should go through the batched writer
+        self._enqueue(('sql', (sql, params)))
+
+    def execute_many_deferred(self, sql, rows):
+        self._enqueue(('many', (sql, list(rows))))
+
+    # Reads
+
+    def get_user(self, user_id):
+        with self.reader() as conn:
+            row = conn.execute(
+                'SELECT user_id, level, progress, last_quiz_score FROM users WHERE user_id = ?', (user_id,)).fetchone()
+        if row is None:
+            return None
+        return {'user_id': row[0], 'level': row[1], 'progress': row[2], 'last_quiz_score': row[3]}
+
+    def recent_attempts(self, user_id, limit=10):
+        with self.reader() as conn:
+            rows = conn.execute(
+                '''SELECT attempt_id, level, score, created_at FROM quiz_attempts
+                   WHERE user_id = ? ORDER BY created_at DESC LIMIT ?''', (user_id, limit)).fetchall()
+        return [{'attempt_id': r[0], 'level': r[1], 'score': r[2], 'created_at': r[3]} for r in rows]
+
+    def stats(self):
+        return {'writes': self.writes, 'commits': self.commits, 'failed': self.failed, 'queued': self._queue.qsize()}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    # One store per process, shared by every Streamlit session
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ProgressStore()
+                atexit.register(_store.flush, 5)
+                register_collector(lambda: {'db_writes_total': _store.writes, 'db_commits_total': _store.commits,
+                                            'db_write_failures_total': _store.failed,
+                                            'db_write_queue_depth': _store._queue.qsize()})
+    return _store
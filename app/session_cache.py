@@ -0,0 +1,81 @@
+import functools
+import os
+from collections import OrderedDict
+
+import streamlit as st
+
+# Results kept per session and function; the least recently used are dropped first
+MAX_ENTRIES = int(os.environ.get('LINGUALEARN_SESSION_CACHE_ITEMS', '32'))
+
+_CACHES_KEY = '_session_caches'
+_ONCE_KEY = '_session_once'
+
+
+class SessionCache:
+    """A bounded LRU of results stored in the current Streamlit session.
+
+    Like st.cache_data, but private to one session and gone when the session
+    ends. Keys are tuples such as (input, language).
+    """
+
+    def __init__(self, name, max_entries=MAX_ENTRIES):
+        self.name = name
+        self.max_entries = max_entries
+
+    def _entries(self):
+        caches = st.session_state.setdefault(_CACHES_KEY, {})
+        return caches.setdefault(self.name, OrderedDict())
+
+    def __contains__(self, key):
+        return key in self._entries()
+
+    def get(self, key, default=None):
+        entries = self._entries()
+        if key not in entries:
+            return default
+        entries.move_to_end(key)
+        return entries[key]
+
+    def put(self, key, value):
+        entries = self._entries()
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        st.session_state.get(_CACHES_KEY, {}).pop(self.name, None)
+
+
+def session_cached(fn=None, *, max_entries=MAX_ENTRIES, keep=None):
+    """Memoizes fn(*args) per session: reruns with the same arguments return the stored result.
+
+    Results for which keep(result) is false (e.g. a temporary error) are returned but not stored.
+    """
+    def decorate(fn):
+        cache = SessionCache(f"{fn.__module__}.{fn.__qualname__}", max_entries)
+
+        @functools.wraps(fn)
+        def wrapper(*args):
+            if args in cache:
+                return cache.get(args)
+            result = fn(*args)
+            if keep is not None and not keep(result):
+                return result
+            return cache.put(args, result)
+        wrapper.cache = cache
+        return wrapper
+    return decorate(fn) if fn is not None else decorate
+
+
+def run_once(name, token):
+    """True the first time it is called with this token in the session, False on every rerun after.
+
+    For side effects that must happen exactly once per event, e.g. run_once('save_quiz', quiz_id).
+    """
+    done = st.session_state.setdefault(_ONCE_KEY, {})
+    if done.get(name) == token:
+        return False
+    done[name] = token
+    return True
@@ -0,0 +1,205 @@
+import heapq
+import math
+import os
+import threading
+import zlib
+import time
+from collections import OrderedDict
+
+DAY = 24 * 3600
+
+# Review queues kept in memory; older ones are reloaded from the database on demand
+QUEUE_CACHE_SIZE = int(os.environ.get('LINGUALEARN_SRS_QUEUES', '5000'))
+
+UPSERT_REVIEW = '''INSERT INTO review_state
+    (user_id, pair, item_id, ease, interval, repetitions, lapses, due_at, last_reviewed)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id, pair, item_id) DO UPDATE SET
+        ease = excluded.ease, interval = excluded.interval, repetitions = excluded.repetitions,
+        lapses = excluded.lapses, due_at = excluded.due_at, last_reviewed = excluded.last_reviewed'''
+
+
+class ReviewState:
+    __slots__ = ('ease', 'interval', 'repetitions', 'lapses', 'due_at', 'last_reviewed')
+
+    def __init__(self, ease=2.5, interval=0.0, repetitions=0, lapses=0, due_at=0.0, last_reviewed=None):
+        self.ease = ease
+        self.interval = interval  # in days
+        self.repetitions = repetitions
+        self.lapses = lapses
+        self.due_at = due_at
+        self.last_reviewed = last_reviewed
+
+
+def sm2(state, quality, now):
+    # SM-2: quality is 0 (blackout) to 5 (perfect); below 3 the item starts over
+    if quality < 3:
+        state.repetitions = 0
+        state.lapses += 1
+        state.interval = 1.0 / 24  # see it again within the hour
+    else:
+        if state.repetitions == 0:
+            state.interval = 1.0
+        elif state.repetitions == 1:
+            state.interval = 6.0
+        else:
+            state.interval = state.interval * state.ease
+        state.repetitions += 1
+    state.ease = max(1.3, state.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    state.last_reviewed = now
+    state.due_at = now + state.interval * DAY
+    return state
+
+
+class ReviewQueue:
+    """One user's cards for one language pair, ordered by due time in a heap.
+
+    Updated cards are pushed again; stale heap entries are skipped when popped.
+    `unseen` holds, per level, how far `unseen_walk` has walked that level's items.
+    """
+
+    def __init__(self, rows=()):
+        self.states = {}
+        self.unseen = {}  # level -> steps taken along its unseen_walk; every item visited before that has been seen
+        self.heap = []
+        for item_id, state in rows:
+            self.states[item_id] = state
+            self.heap.append((state.due_at, item_id))
+        heapq.heapify(self.heap)
+        self.lock = threading.Lock()
+
+    def update(self, item_id, state):
+        self.states[item_id] = state
+        heapq.heappush(self.heap, (state.due_at, item_id))
+        # Drop stale entries once they dominate the heap
+        if len(self.heap) > 2 * len(self.states) + 64:
+            self.heap = [(s.due_at, i) for i, s in self.states.items()]
+            heapq.heapify(self.heap)
+
+    def due(self, now, k):
+        # Earliest-due cards that are due by `now`, without removing them
+        found = []
+        popped = []
+        while self.heap and len(found) < k:
+            due_at, item_id = heapq.heappop(self.heap)
+            state = self.states.get(item_id)
+            if state is None or state.due_at != due_at or item_id in found:
+                continue  # stale entry
+            popped.append((due_at, item_id))
+            if due_at > now:
+                break
+            found.append(item_id)
+        for entry in popped:
+            heapq.heappush(self.heap, entry)
+        return found
+
+
+def unseen_walk(user_id, pair, level, n):
+    # (start, step) of a per-user permutation of range(n): index i is (start + i * step) % n.
+    # A step coprime with n visits every item once, in a different order for every user
+    seed = zlib.crc32(f"{user_id}\x00{pair}\x00{level}".encode('utf-8'))
+    step = (seed % n or 1) if n else 1
+    while n and math.gcd(step, n) != 1:
+        step += 1
+    return (seed // max(n, 1)) % max(n, 1), step
+
+
+class Scheduler:
+    """Spaced-repetition scheduling of vocabulary items, stored in the progress database."""
+
+    def __init__(self, store, bank):
+        self.store = store
+        self.bank = bank
+        self._queues = OrderedDict()  # (user_id, pair) -> ReviewQueue
+        self._lock = threading.Lock()
+
+    def _queue(self, user_id, pair):
+        key = (user_id, pair)
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is not None:
+                self._queues.move_to_end(key)
+                return queue
+        with self.store.reader() as conn:
+            rows = conn.execute(
+                '''SELECT item_id, ease, interval, repetitions, lapses, due_at, last_reviewed
+                   FROM review_state WHERE user_id = ? AND pair = ?''', (user_id, pair)).fetchall()
+        queue = ReviewQueue((row[0], ReviewState(*row[1:])) for row in rows)
+        with self._lock:
+            queue = self._queues.setdefault(key, queue)
+            self._queues.move_to_end(key)
+            while len(self._queues) > QUEUE_CACHE_SIZE:
+                self._queues.popitem(last=False)
+        return queue
+
+    def next_items(self, user_id, source_lang, target_lang, level, k, now=None):
+        """Items for the next quiz: due reviews first, then items the user has never seen."""
+        now = time.time() if now is None else now
+        pair = f"{source_lang}-{target_lang}"
+        queue = self._queue(user_id, pair)
+        with queue.lock:
+            item_ids = queue.due(now, k)
+            seen = queue.states
+        items = [self.bank.item_by_id(item_id) for item_id in item_ids]
+        items = [item for item in items if item is not None]
+
+        candidates = self.bank.items_for(source_lang, target_lang, level)
+        chosen = {item['id'] for item in items}
+        start, step = unseen_walk(user_id, pair, level, len(candidates))
+        with queue.lock:
+            position = queue.unseen.get(level, 0)
+            skipping = True
+            for i in range(position, len(candidates)):
+                if len(items) >= k:
+                    break
+                item = candidates[(start + i * step) % len(candidates)]
+                if item['id'] in seen:
+                    if skipping:
+                        position = i + 1  # seen items stay seen, so the walk never goes back
+                    continue
+                skipping = False
+                if item['id'] not in chosen:
+                    items.append(item)
+                    chosen.add(item['id'])
+            queue.unseen[level] = position
+        if len(items) < k:
+            # Every item at this level has been seen: review what comes due soonest
+            with queue.lock:
+                upcoming = queue.due(float('inf'), k + len(chosen))
+            for item_id in upcoming:
+                item = self.bank.item_by_id(item_id)
+                if item is not None and item_id not in chosen and len(items) < k:
+                    items.append(item)
+                    chosen.add(item_id)
+        return items
+
+    def record_answer(self, user_id, source_lang, target_lang, item_id, correct, now=None):
+        now = time.time() if now is None else now
+        pair = f"{source_lang}-{target_lang}"
+        queue = self._queue(user_id, pair)
+        with queue.lock:
+            previous = queue.states.get(item_id)
+            state = ReviewState() if previous is None else ReviewState(
+                previous.ease, previous.interval, previous.repetitions, previous.lapses,
+                previous.due_at, previous.last_reviewed)
+            sm2(state, 4 if correct else 1, now)
+            queue.update(item_id, state)
+        self.store.execute_deferred(UPSERT_REVIEW, (user_id, pair, item_id, state.ease, state.interval,
+                                                    state.repetitions, state.lapses, state.due_at,
+                                                    state.last_reviewed))
+        return state
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                from progress_store import get_store
+                from vocabulary_bank import get_bank
+                _scheduler = Scheduler(get_store(), get_bank())
+    return _scheduler
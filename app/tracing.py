@@ -0,0 +1,228 @@
+import contextvars
+import functools
+import heapq
+import os
+import threading
+import time
+
+# Tracing is off unless LINGUALEARN_TRACING is set; spans then cost one flag check
+_enabled = os.environ.get('LINGUALEARN_TRACING', '').lower() in ('1', 'true', 'yes')
+
+# Histogram bucket upper bounds, in milliseconds
+BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf'))
+SLOWEST_KEPT = 50
+
+_lock = threading.Lock()
+_histograms = {}  # span name -> Histogram
+_slowest = []  # min-heap of (ms, sequence, record) holding the slowest spans
+_sequence = 0
+_collectors = []
+_current_trace = contextvars.ContextVar('lingualearn_trace', default=None)
+
+
+def enabled():
+    return _enabled
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms):
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ('name', 'attrs', 'start', 'children', '_token')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.children = []
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        parent = _current_trace.get()
+        if parent is not None:
+            parent.children.append(self)
+        self._token = _current_trace.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ms = (time.perf_counter() - self.start) * 1000
+        _current_trace.reset(self._token)
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        _record(self, ms)
+        return False
+
+
+def _record(span, ms):
+    global _sequence
+    stages = {}
+    for child in span.children:
+        stages[child.name] = round(stages.get(child.name, 0.0) + child.attrs.get('_ms', 0.0), 3)
+    span.attrs['_ms'] = ms
+    with _lock:
+        histogram = _histograms.get(span.name)
+        if histogram is None:
+            histogram = _histograms[span.name] = Histogram()
+        histogram.observe(ms)
+        _sequence += 1
+        record = {'operation': span.name, 'ms': ms, 'at': time.time(), 'stages': stages,
+                  **{k: v for k, v in span.attrs.items() if not k.startswith('_')}}
+        entry = (ms, _sequence, record)
+        if len(_slowest) < SLOWEST_KEPT:
+            heapq.heappush(_slowest, entry)
+        elif ms > _slowest[0][0]:
+            heapq.heapreplace(_slowest, entry)
+
+
+def span(name, **attrs):
+    """Times a block: `with span("translate.generate", pair=model_key): ...`"""
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def current():
+    """The innermost open span in this context, or None. Pass it to attach() on another thread."""
+    return _current_trace.get() if _enabled else None
+
+
+class _Attached:
+    __slots__ = ('parents', 'collector', '_token')
+
+    def __init__(self, parents):
+        self.parents = parents
+
+    def __enter__(self):
+        # Collects the spans opened in the block without being recorded itself
+        self.collector = Span(None, {})
+        self._token = _current_trace.set(self.collector)
+        return self
+
+    def __exit__(self, *exc):
+        _current_trace.reset(self._token)
+        for parent in self.parents:
+            parent.children.extend(self.collector.children)
+        return False
+
+
+def attach(parents):
+    """Makes spans opened in a block on a worker thread stages of the callers' spans.
+
+    For work done once on behalf of several callers, e.g. a batch:
+    `with attach([current() captured at submit time, ...]): ...`
+    """
+    parents = [parent for parent in parents if parent is not None]
+    if not _enabled or not parents:
+        return _NOOP
+    return _Attached(parents)
+
+
+def traced(name):
+    """Decorator form of span()."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def register_collector(fn):
+    """fn() returns {metric_name: value}; read when metrics are exported (counters, gauges)."""
+    _collectors.append(fn)
+
+
+def collect():
+    values = {}
+    for fn in list(_collectors):
+        try:
+            values.update(fn())
+        except Exception as e:
+            print(f"Warning: metrics collector failed: {e}")
+    return values
+
+
+def slowest(limit=20):
+    with _lock:
+        entries = sorted(_slowest, reverse=True)[:limit]
+    return [record for _, _, record in entries]
+
+
+def summary():
+    # Per-operation count, mean and max, slowest first
+    with _lock:
+        rows = [{'operation': name, 'count': h.count, 'mean_ms': h.total_ms / h.count, 'max_ms': h.max_ms,
+                 'total_ms': h.total_ms}
+                for name, h in _histograms.items() if h.count]
+    return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+
+def reset():
+    global _sequence
+    with _lock:
+        _histograms.clear()
+        _slowest.clear()
+        _sequence = 0
+
+
+def _metric_name(name):
+    return ''.join(c if c.isalnum() else '_' for c in name)
+
+
+def render_prometheus():
+    lines = ['# HELP lingualearn_span_duration_ms Duration of traced operations',
+             '# TYPE lingualearn_span_duration_ms histogram']
+    with _lock:
+        histograms = {name: (list(h.counts), h.count, h.total_ms) for name, h in _histograms.items()}
+    for name, (counts, count, total_ms) in sorted(histograms.items()):
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS_MS, counts):
+            cumulative += bucket
+            le = '+Inf' if bound == float('inf') else f'{bound:g}'
+            lines.append(f'lingualearn_span_duration_ms_bucket{{operation="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'lingualearn_span_duration_ms_sum{{operation="{name}"}} {total_ms:.3f}')
+        lines.append(f'lingualearn_span_duration_ms_count{{operation="{name}"}} {count}')
+    for name, value in sorted(collect().items()):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        lines.append(f'lingualearn_{_metric_name(name)} {value}')
+    lines.append(f'lingualearn_tracing_enabled {int(_enabled)}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,234 @@
+import os
+import shutil
+import tempfile
+
+from tracing import span
+
+# Where converted models (ONNX, CTranslate2) are stored, see convert_models.py
+MODEL_DIR = os.environ.get('LINGUALEARN_MODEL_DIR',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+
+# Decoding settings shared by every backend; None keeps the model's own default
+NUM_BEAMS = int(os.environ['LINGUALEARN_NUM_BEAMS']) if os.environ.get('LINGUALEARN_NUM_BEAMS') else None
+MAX_LENGTH = int(os.environ.get('LINGUALEARN_MAX_LENGTH', '512'))
+CPU_THREADS = int(os.environ.get('LINGUALEARN_CPU_THREADS', '0'))  # 0 lets the engine decide
+
+
+def converted_path(backend, model_name):
+    return os.path.join(MODEL_DIR, backend, model_name.replace('/', '--'))
+
+
+class TranslationBackend:
+    """Runs one Marian model. Subclasses differ only in the inference engine."""
+
+    name = None
+
+    def __init__(self, model_name, num_beams=NUM_BEAMS, max_length=MAX_LENGTH):
+        self.model_name = model_name
+        self.num_beams = num_beams
+        self.max_length = max_length
+        self.tokenizer = None
+
+    def load(self):
+        from transformers import MarianTokenizer
+        self.tokenizer = MarianTokenizer.from_pretrained(self.model_name)
+        return self
+
+    def translate(self, texts):
+        raise NotImplementedError
+
+    def size_bytes(self):
+        return 0
+
+    def _generate_kwargs(self):
+        kwargs = {'max_length': self.max_length}
+        if self.num_beams is not None:
+            kwargs['num_beams'] = self.num_beams
+        return kwargs
+
+
+class PyTorchBackend(TranslationBackend):
+    name = 'pytorch'
+
+    def load(self):
+        super().load()
+        import torch
+        from transformers import MarianMTModel
+        if CPU_THREADS:
+            torch.set_num_threads(CPU_THREADS)
+        self.model = MarianMTModel.from_pretrained(self.model_name)
+        self.model.eval()
+        return self
+
+    def translate(self, texts):
+        import torch
+        with span("translate.tokenize"):
+            inputs = self.tokenizer(texts, return_tensors="pt", padding=True, truncation=True)
+        with span("translate.generate", backend=self.name), torch.no_grad():
+            translated = self.model.generate(**inputs, **self._generate_kwargs())
+        with span("translate.decode"):
+            return self.tokenizer.batch_decode(translated, skip_special_tokens=True)
+
+    def size_bytes(self):
+        from model_registry import estimate_model_bytes
+        return estimate_model_bytes(self.model)
+
+
+class QuantizedBackend(PyTorchBackend):
+    # Dynamic int8 quantization of the Linear layers; no conversion step needed
+    name = 'quantized'
+
+    def load(self):
+        super().load()
+        import torch
+        self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        return self
+
+    def size_bytes(self):
+        import torch
+        # Quantized weights live in packed params, not in parameters()
+        state = self.model.state_dict()
+        total = 0
+        for value in state.values():
+            if isinstance(value, torch.Tensor):
+                total += value.numel() * value.element_size()
+            elif isinstance(value, tuple):
+                total += sum(v.numel() * v.element_size() for v in value if isinstance(v, torch.Tensor))
+        return total
+
+
+class MmapBackend(PyTorchBackend):
+    # Same model as pytorch, but the weights are memory-mapped from one file on disk, so every
+    # process on the host shares the same read-only pages. Exported on first use (needs torch >= 2.1)
+    name = 'mmap'
+
+    WEIGHTS_FILE = 'weights.pt'
+
+    def load(self):
+        TranslationBackend.load(self)
+        import torch
+        from transformers import GenerationConfig, MarianConfig, MarianMTModel
+        _require_torch_mmap(torch)
+        if CPU_THREADS:
+            torch.set_num_threads(CPU_THREADS)
+        path = converted_path(self.name, self.model_name)
+        if not os.path.isfile(os.path.join(path, self.WEIGHTS_FILE)):
+            export_mmap_weights(self.model_name)
+
+        # Build the model without allocating weights, then point it at the mapped tensors
+        with torch.device('meta'):
+            model = MarianMTModel(MarianConfig.from_pretrained(path))
+        state = torch.load(os.path.join(path, self.WEIGHTS_FILE), mmap=True, weights_only=True)
+        model.load_state_dict(state, assign=True)
+        model.tie_weights()
+        unloaded = [name for name, tensor in [*model.named_parameters(), *model.named_buffers()] if tensor.is_meta]
+        if unloaded:
+            raise RuntimeError(f"{self.model_name}: no mapped weights for {', '.join(unloaded[:3])}")
+        model.generation_config = GenerationConfig.from_pretrained(path)
+        self.model = model.eval()
+        return self
+
+
+def _require_torch_mmap(torch):
+    # torch.load(mmap=True) and load_state_dict(assign=True) appeared in torch 2.1
+    major, minor = (int(part) for part in torch.__version__.split('+')[0].split('.')[:2])
+    if (major, minor) < (2, 1):
+        raise RuntimeError(f"The mmap backend needs torch >= 2.1 (found {torch.__version__}); "
+                           f"upgrade torch or use the pytorch backend")
+
+
+def export_mmap_weights(model_name):
+    # One uncompressed state dict file that torch.load can map instead of reading.
+    # Written to a temporary directory and moved into place, weights last, so a process
+    # starting at the same time never maps a half-written file
+    import torch
+    from transformers import MarianMTModel
+    _require_torch_mmap(torch)
+    path = converted_path(MmapBackend.name, model_name)
+    os.makedirs(path, exist_ok=True)
+    model = MarianMTModel.from_pretrained(model_name)
+    staging = tempfile.mkdtemp(prefix='.export-', dir=path)
+    try:
+        model.config.save_pretrained(staging)
+        model.generation_config.save_pretrained(staging)
+        torch.save(model.state_dict(), os.path.join(staging, MmapBackend.WEIGHTS_FILE))
+        files = sorted(os.listdir(staging), key=lambda name: name == MmapBackend.WEIGHTS_FILE)
+        for name in files:
+            os.replace(os.path.join(staging, name), os.path.join(path, name))
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return path
+
+
+class OnnxBackend(TranslationBackend):
+    # ONNX Runtime through optimum; exported on the fly if convert_models.py was not run
+    name = 'onnx'
+
+    def load(self):
+        super().load()
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        path = converted_path(self.name, self.model_name)
+        if os.path.isdir(path):
+            self.model = ORTModelForSeq2SeqLM.from_pretrained(path)
+        else:
+            self.model = ORTModelForSeq2SeqLM.from_pretrained(self.model_name, export=True)
+        # Where the .onnx files actually are; an on-the-fly export lives in a temporary directory
+        self.model_dir = str(getattr(self.model, 'model_save_dir', None) or path)
+        return self
+
+    def translate(self, texts):
+        inputs = self.tokenizer(texts, return_tensors="pt", padding=True, truncation=True)
+        translated = self.model.generate(**inputs, **self._generate_kwargs())
+        return self.tokenizer.batch_decode(translated, skip_special_tokens=True)
+
+    def size_bytes(self):
+        # The sessions hold the ONNX weights (.onnx files, plus .onnx_data for large models)
+        return _directory_bytes(self.model_dir, suffixes=('.onnx', '.onnx_data'))
+
+
+class CTranslate2Backend(TranslationBackend):
+    # CTranslate2 with int8 weights; needs `python convert_models.py --backend ctranslate2` first
+    name = 'ctranslate2'
+
+    def load(self):
+        super().load()
+        import ctranslate2
+        path = converted_path(self.name, self.model_name)
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"No CTranslate2 model at {path}. Run: python convert_models.py "
+                                    f"--backend ctranslate2 {self.model_name}")
+        self.model = ctranslate2.Translator(path, device='cpu', compute_type='int8',
+                                            intra_threads=CPU_THREADS)
+        return self
+
+    def translate(self, texts):
+        tokens = [self.tokenizer.convert_ids_to_tokens(self.tokenizer.encode(text, truncation=True))
+                  for text in texts]
+        results = self.model.translate_batch(tokens, beam_size=self.num_beams or 4,
+                                             max_decoding_length=self.max_length)
+        return [self.tokenizer.decode(self.tokenizer.convert_tokens_to_ids(result.hypotheses[0]),
+                                      skip_special_tokens=True)
+                for result in results]
+
+    def size_bytes(self):
+        return _directory_bytes(converted_path(self.name, self.model_name))
+
+
+def _directory_bytes(path, suffixes=None):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files
+                     if suffixes is None or f.endswith(suffixes))
+    return total
+
+
+BACKENDS = {backend.name: backend for backend in (PyTorchBackend, QuantizedBackend, MmapBackend, OnnxBackend,
+                                                CTranslate2Backend)}
+
+DEFAULT_BACKEND = os.environ.get('LINGUALEARN_TRANSLATION_BACKEND', 'pytorch')
+
+
+def create_backend(model_name, backend=DEFAULT_BACKEND):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown translation backend: {backend} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[backend](model_name).load()
@@ -0,0 +1,194 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Cache settings, overridable through the environment
+CACHE_PATH = os.environ.get('LINGUALEARN_TRANSLATION_CACHE',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'translation_cache.db'))
+MEMORY_ITEMS = int(os.environ.get('LINGUALEARN_CACHE_MEMORY_ITEMS', '10000'))
+DISK_ITEMS = int(os.environ.get('LINGUALEARN_CACHE_DISK_ITEMS', '500000'))
+TTL_SECONDS = int(os.environ.get('LINGUALEARN_CACHE_TTL_SECONDS', str(30 * 24 * 3600)))
+
+# Connections opened before a fork; kept referenced so the child never closes them
+_inherited_connections = []
+
+
+def normalize_text(text):
+    # "Hello", " Hello " and "Hello\n" should all share one entry
+    return " ".join(unicodedata.normalize('NFC', text).split())
+
+
+def cache_key(model_key, model_name, text):
+    raw = f"{model_key}\x00{model_name}\x00{normalize_text(text)}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class TranslationCache:
+    """Two-level translation cache: an in-memory LRU in front of an SQLite file.
+
+    Entries are keyed by language pair, model name and normalized input text,
+    so changing the model for a pair never returns stale translations.
+
+    The SQLite connection is opened on first use in each process: a forked
+    worker drops the one it inherited and opens its own.
+    """
+
+    def __init__(self, path=CACHE_PATH, memory_items=MEMORY_ITEMS, disk_items=DISK_ITEMS, ttl_seconds=TTL_SECONDS):
+        self.path = path
+        self.memory_items = memory_items
+        self.disk_items = disk_items
+        self.ttl = ttl_seconds
+        self._memory = OrderedDict()  # key -> (translation, created_at)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._model_names = None  # applied by sync_models once the database is open
+        self._writes_since_prune = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # SQLite connections must not be used across fork(); the lock may have been held by another thread
+        self._lock = threading.Lock()
+        if self._conn is not None:
+            _inherited_connections.append(self._conn)
+            self._conn = None
+
+    def _db(self):
+        if self._conn is None and self.path:
+            try:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('PRAGMA synchronous=NORMAL')
+                conn.execute('''CREATE TABLE IF NOT EXISTS translations
+                                (key TEXT PRIMARY KEY, model_key TEXT, translation TEXT, created_at REAL)''')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_translations_created ON translations(created_at)')
+                conn.execute('''CREATE TABLE IF NOT EXISTS cache_models
+                                (model_key TEXT PRIMARY KEY, model_name TEXT)''')
+                conn.commit()
+                if self._model_names:
+                    self._sync(conn, self._model_names)
+                self._conn = conn
+            except sqlite3.Error as e:
+                print(f"Warning: Translation cache disabled on disk: {e}")
+                self.path = None
+        return self._conn
+
+    def sync_models(self, model_names):
+        # Drop cached translations for pairs whose model has changed. Runs when the
+        # database is first opened, so importing nlp_utils does no database work
+        with self._lock:
+            self._model_names = dict(model_names)
+            self._memory.clear()
+            if self._conn is not None:
+                self._sync(self._conn, self._model_names)
+
+    @staticmethod
+    def _sync(conn, model_names):
+        known = dict(conn.execute('SELECT model_key, model_name FROM cache_models'))
+        for model_key, model_name in model_names.items():
+            if known.get(model_key) != model_name:
+                conn.execute('DELETE FROM translations WHERE model_key = ?', (model_key,))
+                conn.execute('INSERT OR REPLACE INTO cache_models VALUES (?, ?)', (model_key, model_name))
+        conn.commit()
+
+    def _expired(self, created_at, now):
+        return self.ttl and now - created_at > self.ttl
+
+    def get_many(self, model_key, model_name, texts):
+        # Returns {index: translation} for the texts found in the cache
+        now = time.time()
+        found = {}
+        missing = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                key = cache_key(model_key, model_name, text)
+                entry = self._memory.get(key)
+                if entry is not None and not self._expired(entry[1], now):
+                    self._memory.move_to_end(key)
+                    found[i] = entry[0]
+                    self.memory_hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+
+            conn = self._db() if missing else None
+            if conn is not None:
+                keys = list(missing)
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT key, translation, created_at FROM translations WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk).fetchall()
+                    for key, translation, created_at in rows:
+                        if self._expired(created_at, now):
+                            continue
+                        self._remember(key, translation, created_at)
+                        for i in missing.pop(key):
+                            found[i] = translation
+                            self.disk_hits += 1
+            self.misses += sum(len(indices) for indices in missing.values())
+        return found
+
+    def get(self, model_key, model_name, text):
+        return self.get_many(model_key, model_name, [text]).get(0)
+
+    def put_many(self, model_key, model_name, texts, translations):
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, translation in zip(texts, translations):
+                key = cache_key(model_key, model_name, text)
+                self._remember(key, translation, now)
+                rows.append((key, model_key, translation, now))
+            conn = self._db()
+            if conn is None:
+                return
+            conn.executemany('INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?)', rows)
+            conn.commit()
+            self._writes_since_prune += len(rows)
+            if self._writes_since_prune >= 1000:
+                self._prune(conn, now)
+
+    def put(self, model_key, model_name, text, translation):
+        self.put_many(model_key, model_name, [text], [translation])
+
+    def _remember(self, key, translation, created_at):
+        self._memory[key] = (translation, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _prune(self, conn, now):
+        self._writes_since_prune = 0
+        if self.ttl:
+            conn.execute('DELETE FROM translations WHERE created_at < ?', (now - self.ttl,))
+        excess = conn.execute('SELECT COUNT(*) FROM translations').fetchone()[0] - self.disk_items
+        if excess > 0:
+            conn.execute('''DELETE FROM translations WHERE key IN
+                            (SELECT key FROM translations ORDER BY created_at LIMIT ?)''', (excess,))
+        conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            conn = self._db()
+            if conn is not None:
+                conn.execute('DELETE FROM translations')
+                conn.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                'memory_items': len(self._memory),
+            }
@@ -0,0 +1,71 @@
+import heapq
+
+# Preferred pivot language; routes through it are slightly cheaper than through others
+PIVOT_LANGUAGE = 'English'
+
+
+class TranslationRouter:
+    """Finds the cheapest chain of available translation models between two languages.
+
+    The graph is built from the keys of `model_names` ('Source-Target'), so
+    adding a model is enough to make every language reachable through English.
+    """
+
+    def __init__(self, model_names, hop_cost=1.0, pivot_bonus=0.1):
+        self.model_names = model_names
+        self.hop_cost = hop_cost
+        self.pivot_bonus = pivot_bonus
+
+    def _graph(self):
+        graph = {}
+        for model_key in self.model_names:
+            source, _, target = model_key.partition('-')
+            graph.setdefault(source, []).append(target)
+            graph.setdefault(target, [])
+        return graph
+
+    def languages(self):
+        return sorted(self._graph())
+
+    def route(self, source_lang, target_lang):
+        """List of model keys to run in order, [] for the same language, None if unreachable."""
+        if source_lang == target_lang:
+            return []
+        direct = f"{source_lang}-{target_lang}"
+        if direct in self.model_names:
+            return [direct]
+
+        graph = self._graph()
+        best = {source_lang: 0.0}
+        heap = [(0.0, source_lang, [])]
+        while heap:
+            cost, language, path = heapq.heappop(heap)
+            if language == target_lang:
+                return path
+            if cost > best.get(language, float('inf')):
+                continue
+            for neighbour in graph.get(language, []):
+                step = self.hop_cost - (self.pivot_bonus if neighbour == PIVOT_LANGUAGE else 0.0)
+                new_cost = cost + step
+                if new_cost < best.get(neighbour, float('inf')):
+                    best[neighbour] = new_cost
+                    heapq.heappush(heap, (new_cost, neighbour, path + [f"{language}-{neighbour}"]))
+        return None
+
+    def plan(self, source_lang, target_langs):
+        """Routes for several targets, grouped so shared first hops run only once.
+
+        Returns {first_hop: [(target_lang, remaining_hops), ...]} plus a list of
+        unreachable targets.
+        """
+        groups = {}
+        unreachable = []
+        for target in target_langs:
+            route = self.route(source_lang, target)
+            if route is None:
+                unreachable.append(target)
+            elif not route:
+                groups.setdefault(None, []).append((target, []))
+            else:
+                groups.setdefault(route[0], []).append((target, route[1:]))
+        return groups, unreachable
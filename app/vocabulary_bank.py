@@ -0,0 +1,170 @@
+import csv
+import json
+import os
+import random
+import sqlite3
+import threading
+
+VOCABULARY_PATH = os.environ.get('LINGUALEARN_VOCABULARY',
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'vocabulary.json'))
+
+# Levels are cumulative: an Intermediate quiz can also use Beginner items
+LEVELS = ['Beginner', 'Intermediate', 'Advanced']
+
+# Candidate wrong answers kept for every word; quizzes sample 3 of them
+DISTRACTOR_POOL_SIZE = 12
+
+
+def levels_from(level):
+    # The given level and every level above it (unknown levels count as Advanced)
+    if level not in LEVELS:
+        level = LEVELS[-1]
+    return LEVELS[LEVELS.index(level):]
+
+
+class VocabularyBank:
+    """Quiz content, loaded once and indexed for fast quiz generation.
+
+    Items are concepts with one translation per language. Indexes:
+    - (source, target, level) -> items usable for that pair and level, in file order
+    - (language, level) -> fill-in-the-blank sentences
+    - (language, word) -> a precomputed pool of distractors
+    """
+
+    def __init__(self, items, fill_blanks, seed=0):
+        self.items = items
+        self.fill_blanks = fill_blanks
+        self.languages = sorted({lang for item in items for lang in item['translations']})
+        self._rng = random.Random(seed)
+        self._by_pair_level = {}
+        self._fill_by_level = {}
+        self._distractors = {}
+        self._by_id = {item['id']: item for item in items}
+        self._build_indexes()
+
+    def _build_indexes(self):
+        for item in self.items:
+            languages = list(item['translations'])
+            for level in levels_from(item.get('level')):
+                for source in languages:
+                    for target in languages:
+                        if source != target:
+                            self._by_pair_level.setdefault((source, target, level), []).append(item)
+
+        for entry in self.fill_blanks:
+            for level in levels_from(entry.get('level', LEVELS[0])):
+                self._fill_by_level.setdefault((entry['language'], level), []).append(entry)
+
+        # Distractors come from the same level when possible, so they look plausible
+        for language in self.languages:
+            words = list(dict.fromkeys(item['translations'][language]
+                                       for item in self.items if language in item['translations']))
+            words_by_level = {}
+            for item in self.items:
+                word = item['translations'].get(language)
+                if word is not None:
+                    words_by_level.setdefault(item.get('level', LEVELS[-1]), []).append(word)
+            for item in self.items:
+                word = item['translations'].get(language)
+                if word is None or (language, word) in self._distractors:
+                    continue
+                same_level = words_by_level.get(item.get('level', LEVELS[-1]), [])
+                self._distractors[(language, word)] = self._pick_pool(word, same_level, words)
+
+    def _pick_pool(self, word, preferred, everything):
+        pool = []
+        for candidates in (preferred, everything):
+            if len(candidates) <= 4 * DISTRACTOR_POOL_SIZE:
+                choices = [w for w in candidates if w != word]
+                self._rng.shuffle(choices)
+            else:
+                # Large vocabularies: draw random candidates instead of scanning them all
+                choices = (candidates[self._rng.randrange(len(candidates))] for _ in range(4 * DISTRACTOR_POOL_SIZE))
+            for candidate in choices:
+                if candidate != word and candidate not in pool:
+                    pool.append(candidate)
+                    if len(pool) == DISTRACTOR_POOL_SIZE:
+                        return pool
+        return pool
+
+    # Lookups used by generate_quiz
+
+    def items_for(self, source_lang, target_lang, level):
+        return self._by_pair_level.get((source_lang, target_lang, level), [])
+
+    def item_by_id(self, item_id):
+        return self._by_id.get(item_id)
+
+    def distractors(self, word, language, k=3):
+        pool = self._distractors.get((language, word), [])
+        return random.sample(pool, min(k, len(pool)))
+
+    def fill_blanks_for(self, language, level):
+        return self._fill_by_level.get((language, level), [])
+
+    def has_language(self, language):
+        return language in self.languages
+
+
+def load_json(path):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return data.get('items', []), data.get('fill_blank', [])
+
+
+def load_csv(path):
+    # Columns: id, level, then one column per language
+    items = []
+    with open(path, encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            item_id = row.pop('id')
+            level = row.pop('level', None) or LEVELS[-1]
+            items.append({'id': item_id, 'level': level,
+                          'translations': {lang: text for lang, text in row.items() if text}})
+    return items, []
+
+
+def load_sqlite(path):
+    # Tables: vocabulary(id, level, language, text) and optionally
+    # fill_blank(id, language, level, sentence, options) with options as a JSON list
+    conn = sqlite3.connect(path)
+    try:
+        items = {}
+        for item_id, level, language, text in conn.execute(
+                'SELECT id, level, language, text FROM vocabulary ORDER BY rowid'):
+            item = items.setdefault(item_id, {'id': item_id, 'level': level, 'translations': {}})
+            item['translations'][language] = text
+        fill_blanks = []
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='fill_blank'").fetchone():
+            for item_id, language, level, sentence, options in conn.execute(
+                    'SELECT id, language, level, sentence, options FROM fill_blank ORDER BY rowid'):
+                fill_blanks.append({'id': item_id, 'language': language, 'level': level,
+                                    'sentence': sentence, 'options': json.loads(options)})
+        return list(items.values()), fill_blanks
+    finally:
+        conn.close()
+
+
+LOADERS = {'.json': load_json, '.csv': load_csv, '.db': load_sqlite, '.sqlite': load_sqlite}
+
+
+def load_bank(path=VOCABULARY_PATH):
+    loader = LOADERS.get(os.path.splitext(path)[1].lower())
+    if loader is None:
+        raise ValueError(f"Unsupported vocabulary file: {path}")
+    items, fill_blanks = loader(path)
+    return VocabularyBank(items, fill_blanks)
+
+
+_bank = None
+_bank_lock = threading.Lock()
+
+
+def get_bank():
+    # Loaded once per process and shared by every session
+    global _bank
+    if _bank is None:
+        with _bank_lock:
+            if _bank is None:
+                _bank = load_bank()
+    return _bank
@@ -0,0 +1,84 @@
+"""Benchmark for answer recording and the analytics reports.
+
+Writes a synthetic answer history (1M answers by default) through the same
+INSERT as the app, so the aggregate trigger runs for every row, then times
+the reports the dashboard shows.
+
+    python benchmarks/bench_analytics.py --answers 1000000 --users 20000 --items 5000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from harness import percentile  # also puts app/ on sys.path
+from analytics import INSERT_EVENT, Analytics
+from progress_store import ProgressStore
+from vocabulary_bank import LEVELS
+
+QUIZ_SIZE = 3
+
+
+def build(store, answers, users, items):
+    now = time.time()
+    # Seeded on a pooled connection directly, bypassing the batched writer
+    with store.reader() as conn:
+        rows = []
+        for quiz in range(answers // QUIZ_SIZE):
+            user = random.randrange(users)
+            answered_at = now - random.uniform(0, 90) * 86400
+            for position in range(QUIZ_SIZE):
+                item = random.randrange(items)
+                rows.append((f'quiz{quiz}', position, f'user{user}', 'English-French', f'w{item}', LEVELS[item % 3],
+                             'translation', int(random.random() < 0.4 + 0.5 * (user % 10) / 10), answered_at))
+            if len(rows) >= 30000:
+                with conn:
+                    conn.executemany(INSERT_EVENT, rows)
+                rows = []
+        with conn:
+            conn.executemany(INSERT_EVENT, rows)
+
+
+def timed(fn, rounds):
+    values = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        values.append((time.perf_counter() - start) * 1000)
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--answers', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ProgressStore(os.path.join(tmp, 'bench.db'))
+        start = time.perf_counter()
+        build(store, args.answers, args.users, args.items)
+        elapsed = time.perf_counter() - start
+        print(f"recorded {args.answers} answers in {elapsed:.1f}s ({args.answers / elapsed:.0f} answers/s)")
+
+        analytics = Analytics(store)
+        users = [f'user{random.randrange(args.users)}' for _ in range(200)]
+        reports = {
+            'estimate_level (one user)': lambda: analytics.estimate_level(random.choice(users)),
+            'overview': analytics.overview,
+            'item_difficulty': analytics.item_difficulty,
+            'user_summary': analytics.user_summary,
+            'cohorts': analytics.cohorts,
+        }
+        for name, fn in reports.items():
+            values = timed(fn, args.rounds if name != 'estimate_level (one user)' else 200)
+            print(f"{name}: p50={percentile(values, 50):.1f}ms p95={percentile(values, 95):.1f}ms "
+                  f"mean={statistics.mean(values):.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
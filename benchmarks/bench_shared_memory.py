@@ -0,0 +1,145 @@
+"""Per-process memory of worker processes holding the NLP models.
+
+Starts N workers that each hold the same resources and reports their RSS and
+PSS (proportional set size: a page shared by k processes counts 1/k in each)
+from /proc/<pid>/smaps_rollup, while all of them are alive. Linux only.
+
+    python benchmarks/bench_shared_memory.py --resources English-French,spacy --workers 1 2 4 8
+    python benchmarks/bench_shared_memory.py --backend mmap --mode fork
+    python benchmarks/bench_shared_memory.py --stand-in 300    # synthetic 300 MB model, no downloads
+
+Modes:
+  independent  each worker loads the resources itself (separate Streamlit processes)
+  fork         the parent loads them once, then forks the workers
+               (inference_server.py --processes N --preload ...)
+With --backend mmap the weights are file-backed pages, shared in both modes.
+"""
+import argparse
+import gc
+import mmap
+import multiprocessing
+import os
+import tempfile
+
+from harness import environment, save  # also puts app/ on sys.path
+
+os.environ.setdefault('HF_HUB_OFFLINE', '1')
+os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+# Workers must run the models, not read each other's cached translations
+os.environ['LINGUALEARN_TRANSLATION_CACHE'] = ''
+
+_loaded = None  # what the worker holds; set in the parent before forking in fork mode
+
+
+class StandInModel:
+    """A block of weights either read into the heap (pytorch) or mapped from the file (mmap)."""
+
+    def __init__(self, path, mapped):
+        with open(path, 'rb') as f:
+            self.weights = mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ) if mapped else f.read()
+
+    def run(self):
+        # Read every page, as inference reads every weight
+        return sum(self.weights[i] for i in range(0, len(self.weights), mmap.PAGESIZE))
+
+
+def load(args):
+    if args.stand_in:
+        return StandInModel(args.stand_in_path, args.backend == 'mmap')
+    import nlp_utils
+    nlp_utils.warm_up(args.resources)
+    return nlp_utils
+
+
+def run(loaded):
+    if isinstance(loaded, StandInModel):
+        loaded.run()
+        return
+    for model_key in loaded.model_registry.loaded():
+        loaded._run_model(model_key, ["Hello, how are you?"])
+    for language in loaded.nlp_models:
+        if loaded.nlp_models[language].status == 'loaded':
+            loaded.analyze_grammar("Hello, how are you?", language)
+
+
+def memory_mb(pid='self'):
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if name in ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty'):
+                values[name.lower() + '_mb'] = int(rest.split()[0]) / 1024
+    return values
+
+
+def worker(args, barrier, results):
+    loaded = _loaded if _loaded is not None else load(args)
+    run(loaded)
+    barrier.wait()  # measure only once every worker holds the resources
+    results.put(memory_mb())
+    barrier.wait()
+
+
+def measure(args, count):
+    global _loaded
+    context = multiprocessing.get_context('fork' if args.mode == 'fork' else 'spawn')
+    if args.mode == 'fork':
+        _loaded = _loaded or load(args)
+        gc.freeze()
+    barrier = context.Barrier(count + 1)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(args, barrier, results)) for _ in range(count)]
+    for process in processes:
+        process.start()
+    barrier.wait()
+    workers = [results.get() for _ in range(count)]
+    parent = memory_mb()
+    barrier.wait()
+    for process in processes:
+        process.join()
+
+    mean = {key: sum(w[key] for w in workers) / count for key in workers[0]}
+    # In fork mode the parent stays alive holding the originals, as the server's parent does
+    total_pss = sum(w['pss_mb'] for w in workers) + (parent['pss_mb'] if args.mode == 'fork' else 0)
+    return {'workers': count, 'mean': mean, 'parent': parent, 'total_pss_mb': total_pss}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0], epilog=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--resources', default='English-French,spacy', help='what each worker loads (see warm_up)')
+    parser.add_argument('--backend', default='pytorch', choices=['pytorch', 'quantized', 'mmap'])
+    parser.add_argument('--mode', default='independent', choices=['independent', 'fork'])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--stand-in', type=int, metavar='MB', help='use a synthetic model of this size instead')
+    parser.add_argument('--output', help='save the results as JSON')
+    args = parser.parse_args()
+    os.environ['LINGUALEARN_TRANSLATION_BACKEND'] = args.backend
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.stand_in:
+            args.stand_in_path = os.path.join(tmp, 'weights.bin')
+            with open(args.stand_in_path, 'wb') as f:
+                for _ in range(args.stand_in):
+                    f.write(os.urandom(1024 * 1024))
+
+        rows = []
+        print(f"mode={args.mode} backend={args.backend} "
+              f"{'stand-in ' + str(args.stand_in) + ' MB' if args.stand_in else args.resources}")
+        print(f"{'workers':>7} {'RSS/proc':>10} {'PSS/proc':>10} {'shared/proc':>12} {'total PSS':>10}")
+        for count in args.workers:
+            row = measure(args, count)
+            rows.append(row)
+            mean = row['mean']
+            shared = mean['shared_clean_mb'] + mean['shared_dirty_mb']
+            print(f"{count:>7} {mean['rss_mb']:>8.0f}MB {mean['pss_mb']:>8.0f}MB {shared:>10.0f}MB "
+                  f"{row['total_pss_mb']:>8.0f}MB")
+
+    if args.output:
+        save({'environment': environment(), 'mode': args.mode, 'backend': args.backend,
+              'resources': f'stand-in {args.stand_in} MB' if args.stand_in else args.resources,
+              'results': rows}, args.output)
+
+
+if __name__ == '__main__':
+    main()
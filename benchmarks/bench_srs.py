@@ -0,0 +1,70 @@
+"""Benchmark for spaced-repetition item selection.
+
+Builds a synthetic bank (100k items by default) and a progress database with
+review history for many users, then times Scheduler.next_items.
+
+    python benchmarks/bench_srs.py --items 100000 --users 200 --reviewed 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from harness import percentile  # also puts app/ on sys.path
+from progress_store import ProgressStore
+from srs import Scheduler, UPSERT_REVIEW
+from vocabulary_bank import LEVELS, VocabularyBank
+
+
+def build(items, users, reviewed, path):
+    bank = VocabularyBank([{'id': f'w{i}', 'level': LEVELS[i % 3],
+                            'translations': {'English': f'en{i}', 'French': f'fr{i}'}}
+                           for i in range(items)], [])
+    store = ProgressStore(path)
+    now = time.time()
+    # Seeded on a pooled connection directly, bypassing the batched writer
+    with store.reader() as conn, conn:
+        for u in range(users):
+            rows = []
+            for i in random.sample(range(items), min(reviewed, items)):
+                due_at = now + random.uniform(-5, 30) * 86400
+                rows.append((f'user{u}', 'English-French', f'w{i}', 2.5, 6.0, 2, 0, due_at, now - 86400))
+            conn.executemany(UPSERT_REVIEW, rows)
+    return bank, store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--reviewed', type=int, default=2000, help='review rows per user')
+    parser.add_argument('--rounds', type=int, default=20, help='quizzes per user')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        bank, store = build(args.items, args.users, args.reviewed, os.path.join(tmp, 'bench.db'))
+        print(f"setup: {time.perf_counter() - start:.1f}s")
+
+        scheduler = Scheduler(store, bank)
+        cold, warm = [], []
+        for u in range(args.users):
+            user = f'user{u}'
+            for r in range(args.rounds):
+                t = time.perf_counter()
+                items = scheduler.next_items(user, 'English', 'French', 'Advanced', 2)
+                (cold if r == 0 else warm).append((time.perf_counter() - t) * 1000)
+                for item in items:
+                    scheduler.record_answer(user, 'English', 'French', item['id'], random.random() < 0.7)
+        store.flush()
+
+        for name, values in (('first quiz (loads queue)', cold), ('next quizzes', warm)):
+            print(f"{name}: p50={percentile(values, 50):.3f}ms p95={percentile(values, 95):.3f}ms "
+                  f"p99={percentile(values, 99):.3f}ms mean={statistics.mean(values):.3f}ms")
+        print("sub-millisecond selection:", "yes" if percentile(warm, 95) < 1.0 else "NO")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Timing helpers shared by the benchmark scripts."""
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def summarize(latencies_ms):
+    return {
+        'count': len(latencies_ms),
+        'p50_ms': percentile(latencies_ms, 50),
+        'p95_ms': percentile(latencies_ms, 95),
+        'p99_ms': percentile(latencies_ms, 99),
+        'mean_ms': sum(latencies_ms) / len(latencies_ms) if latencies_ms else None,
+    }
+
+
+def time_calls(fn, inputs):
+    # Latency of fn(x) for every x, in milliseconds
+    latencies = []
+    for x in inputs:
+        start = time.perf_counter()
+        fn(x)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return summarize(latencies)
+
+
+def throughput(fn, inputs, concurrency):
+    # Calls per second with `concurrency` threads calling fn at the same time
+    latencies = []
+
+    def call(x):
+        start = time.perf_counter()
+        fn(x)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, inputs))
+    elapsed = time.perf_counter() - start
+    result = summarize(latencies)
+    result.update({'concurrency': concurrency, 'calls_per_second': len(inputs) / elapsed})
+    return result
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=APP_DIR).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def save(results, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+def compare(old, new, path=(), threshold=0.1, min_delta_ms=0.05):
+    # Yields (metric, old, new) for metrics that got more than `threshold` worse.
+    # Latency changes smaller than min_delta_ms are timer noise and ignored
+    if isinstance(new, dict):
+        for key, value in new.items():
+            if isinstance(old, dict) and key in old:
+                yield from compare(old[key], value, path + (key,), threshold, min_delta_ms)
+    elif isinstance(new, (int, float)) and isinstance(old, (int, float)) and old > 0:
+        name = path[-1] if path else ''
+        if name.endswith('_ms') and abs(new - old) < min_delta_ms:
+            return
+        slower = new > old * (1 + threshold) if name.endswith(('_ms', '_seconds', '_mb')) else \
+            new < old * (1 - threshold) if name == 'calls_per_second' else False
+        if slower:
+            yield '.'.join(str(p) for p in path), old, new
@@ -0,0 +1,234 @@
+"""Benchmarks for translate_text, analyze_grammar, correct_text and generate_quiz.
+
+Runs offline. By default it uses locally cached models (Hugging Face offline
+mode, installed spaCy models, a local LanguageTool). With --stand-in it swaps
+in tiny stand-ins instead: a translation backend with a fixed per-batch cost,
+blank spaCy pipelines and a LanguageTool checker with a fixed latency, so the
+surrounding code (caching, batching, pooling) can be measured anywhere.
+
+    python benchmarks/run_benchmarks.py --stand-in --output results.json
+    python benchmarks/run_benchmarks.py --output new.json --compare results.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from harness import APP_DIR, compare, environment, peak_rss_mb, save, throughput, time_calls
+
+os.environ.setdefault('HF_HUB_OFFLINE', '1')
+os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+
+SENTENCES = {
+    'English': ["Hello, how are you?", "I am learning a new language.", "The book is on the table.",
+                "Thank you for your help with this exercise.", "She buyed a new book yesterday."],
+    'French': ["Bonjour, comment allez-vous ?", "J'apprends une nouvelle langue.", "Le livre est sur la table.",
+               "Merci pour votre aide avec cet exercice.", "Elle a acheter un nouveau livre hier."],
+}
+
+
+# Stand-ins
+
+class StandInBackend:
+    """Translation backend whose cost grows with batch size like a real model, minus the model."""
+
+    name = 'stand-in'
+    batch_ms = 20.0
+    per_sentence_ms = 2.0
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+    def load(self):
+        time.sleep(0.05)
+        return self
+
+    def translate(self, texts):
+        time.sleep((self.batch_ms + self.per_sentence_ms * len(texts)) / 1000)
+        return [text[::-1] for text in texts]
+
+    def size_bytes(self):
+        return 1024 * 1024
+
+
+class StandInChecker:
+    latency_ms = 15.0
+
+    def __init__(self, code, remote_server=None):
+        self.code = code
+
+    def check(self, text):
+        time.sleep(self.latency_ms / 1000)
+        return []
+
+
+def install_stand_ins():
+    import nlp_utils
+    import translation_backends
+    from correction_service import CorrectionService
+    from lazy_resources import LazyResource
+
+    translation_backends.BACKENDS['stand-in'] = StandInBackend
+    for model_key in nlp_utils.model_names:
+        nlp_utils.model_backends[model_key] = 'stand-in'
+    nlp_utils.correction_service = CorrectionService(nlp_utils.languagetool_codes, factory=StandInChecker)
+
+    def blank(code):
+        def load():
+            import spacy
+            nlp = spacy.blank(code)
+            nlp.add_pipe('sentencizer')
+            return nlp
+        return load
+    for language, code in {'English': 'en', 'French': 'fr', 'Arabic': 'xx'}.items():
+        nlp_utils.nlp_models[language] = LazyResource(f"spaCy blank {code}", blank(code))
+
+
+def prepare(stand_in):
+    # Benchmarks must not read or pollute the app's translation cache
+    os.environ['LINGUALEARN_TRANSLATION_CACHE'] = ''
+    if stand_in:
+        install_stand_ins()
+
+
+# Cold start runs in a fresh interpreter
+
+def cold_start_child(stand_in):
+    start = time.perf_counter()
+    prepare(stand_in)
+    import nlp_utils
+    from exercises import generate_quiz
+    result = {'import_seconds': time.perf_counter() - start}
+    for name, call in (('translate_text', lambda: nlp_utils.translate_text("Hello", 'English', 'French')),
+                       ('analyze_grammar', lambda: nlp_utils.analyze_grammar("Hello there", 'English')),
+                       ('correct_text', lambda: nlp_utils.correct_text("Hello there", 'English')),
+                       ('generate_quiz', lambda: generate_quiz('Intermediate', 'English', 'French'))):
+        t = time.perf_counter()
+        call()
+        result[f'first_{name}_seconds'] = time.perf_counter() - t
+    result['peak_rss_mb'] = peak_rss_mb()
+    print(json.dumps(result))
+
+
+def cold_start(stand_in):
+    command = [sys.executable, os.path.abspath(__file__), '--cold-child']
+    if stand_in:
+        command.append('--stand-in')
+    output = subprocess.run(command, capture_output=True, text=True, cwd=APP_DIR, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+# Warm benchmarks
+
+def unique(sentences, count, tag):
+    # Distinct inputs so results are not served from the translation cache
+    return [f"{sentences[i % len(sentences)]} ({tag} {i})" for i in range(count)]
+
+
+def run(args):
+    prepare(args.stand_in)
+    import nlp_utils
+    from exercises import generate_quiz
+
+    results = {'environment': environment(), 'stand_in': args.stand_in}
+    print("cold start...", file=sys.stderr)
+    results['cold_start'] = cold_start(args.stand_in)
+    nlp_utils.warm_up('all')
+
+    n = args.iterations
+    english = SENTENCES['English']
+    warm = {}
+
+    print("translate_text...", file=sys.stderr)
+    warm['translate_text'] = time_calls(lambda s: nlp_utils.translate_text(s, 'English', 'French'),
+                                        unique(english, n, 'warm'))
+    warm['translate_text_cached'] = time_calls(lambda s: nlp_utils.translate_text(s, 'English', 'French'),
+                                               unique(english, n, 'warm'))
+    print("analyze_grammar...", file=sys.stderr)
+    warm['analyze_grammar'] = time_calls(lambda s: nlp_utils.analyze_grammar(s, 'English'), english * (n // 5))
+    print("correct_text...", file=sys.stderr)
+    warm['correct_text'] = time_calls(lambda s: nlp_utils.correct_text(s, 'English'), unique(english, n, 'c'))
+    print("generate_quiz...", file=sys.stderr)
+    warm['generate_quiz'] = time_calls(lambda level: generate_quiz(level, 'English', 'French'),
+                                       ['Beginner', 'Intermediate', 'Advanced'] * max(1, n // 3))
+    results['warm'] = warm
+
+    concurrency = {}
+    for c in args.concurrency:
+        print(f"concurrency {c}...", file=sys.stderr)
+        concurrency[f'c{c}'] = {
+            'translate_text': throughput(lambda s: nlp_utils.translate_text(s, 'English', 'French'),
+                                         unique(english, n, f'c{c}'), c),
+            'correct_text': throughput(lambda s: nlp_utils.correct_text(s, 'English'),
+                                       unique(english, n, f'lt{c}'), c),
+        }
+    results['concurrency'] = concurrency
+
+    batches = {}
+    for size in args.batch_sizes:
+        print(f"batch size {size}...", file=sys.stderr)
+        rounds = max(1, n // size)
+        texts = unique(english, size * rounds, f'b{size}')
+        chunks = [texts[i:i + size] for i in range(0, len(texts), size)]
+        entry = {}
+        for name, fn in (('translate_batch', lambda chunk: nlp_utils.translate_batch(chunk, 'English', 'French')),
+                         ('analyze_grammar_batch', lambda chunk: nlp_utils.analyze_grammar_batch(chunk, 'English')),
+                         ('correct_text_batch', lambda chunk: nlp_utils.correct_text_batch(chunk, 'English'))):
+            try:
+                stats = time_calls(fn, chunks)
+            except ValueError as e:  # e.g. no spaCy model installed
+                entry[name] = {'error': str(e)}
+                continue
+            stats['items_per_second'] = 1000 * size / stats['mean_ms']
+            entry[name] = stats
+        batches[f'b{size}'] = entry
+    results['batch'] = batches
+
+    results['peak_rss_mb'] = peak_rss_mb()
+    results['caches'] = {'models': nlp_utils.model_registry.stats(), 'translations': nlp_utils.translation_cache.stats(),
+                         'batcher': nlp_utils.translation_batcher.stats()}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0], epilog=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stand-in', action='store_true', help='use tiny stand-in models')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='earlier results JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change reported as a regression')
+    parser.add_argument('--cold-child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_child:
+        cold_start_child(args.stand_in)
+        return
+
+    output = os.path.abspath(args.output)
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    os.chdir(APP_DIR)
+    results = run(args)
+    save(results, output)
+    for name, stats in results['warm'].items():
+        print(f"{name:24s} p50={stats['p50_ms']:.2f}ms p95={stats['p95_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms")
+    print(f"peak RSS: {results['peak_rss_mb']:.0f} MB -> {output}")
+
+    if baseline:
+        with open(baseline, encoding='utf-8') as f:
+            old = json.load(f)
+        regressions = list(compare({k: v for k, v in old.items() if k != 'environment'},
+                                   {k: v for k, v in results.items() if k != 'environment'},
+                                   threshold=args.threshold))
+        for metric, before, after in regressions:
+            print(f"REGRESSION {metric}: {before:.3f} -> {after:.3f}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()